@@ -1,24 +1,38 @@
 import os
+import queue
 import io
 import asyncio
+import contextlib
+import dataclasses
 import sqlite3
+import struct
+import threading
+import time
 import datetime
+import functools
+import heapq
+import itertools
 import random
-from collections import defaultdict
+import re
+from collections import OrderedDict, defaultdict
+from typing import Literal
 
 import discord
 from discord import app_commands
-from discord.ext import commands, tasks
+from discord.ext import commands
 from dotenv import load_dotenv
 
 # ==================== ENV ====================
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-dotenv_path = os.path.join(BASE_DIR, ".env")
-if os.path.exists(dotenv_path):
-    load_dotenv(dotenv_path)
-else:
-    load_dotenv()
+# Auf Railway kommen die Variablen direkt aus der Umgebung -> .env nicht parsen
+if not (os.getenv("RAILWAY_ENVIRONMENT") or os.getenv("DOTENV_LOADED")):
+    dotenv_path = os.path.join(BASE_DIR, ".env")
+    if os.path.exists(dotenv_path):
+        load_dotenv(dotenv_path)
+    else:
+        load_dotenv()
+    os.environ["DOTENV_LOADED"] = "1"
 
 TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 
@@ -33,10 +47,11 @@ def env_int(key: str):
         return None
 
 
-def env_int_list(key: str) -> list[int]:
+def env_int_list(key: str) -> tuple[int, ...]:
+    # Tuple: Config wird einmal beim Import geparst und ist danach unveränderlich
     v = os.getenv(key)
     if not v:
-        return []
+        return ()
     out: list[int] = []
     for part in v.split(","):
         part = part.strip()
@@ -46,15 +61,17 @@ def env_int_list(key: str) -> list[int]:
             out.append(int(part))
         except ValueError:
             pass
-    return out
+    return tuple(out)
 
 
 WELCOME_CHANNEL_ID = env_int("WELCOME_CHANNEL_ID")
 LOG_CHANNEL_ID = env_int("LOG_CHANNEL_ID")
+_LOG_ENABLED = bool(LOG_CHANNEL_ID)
 
 TICKET_CATEGORY_ID = env_int("TICKET_CATEGORY_ID")
 TICKET_PANEL_CHANNEL_ID = env_int("TICKET_PANEL_CHANNEL_ID")
-TICKET_STAFF_ROLE_IDS = env_int_list("TICKET_STAFF_ROLE_ID")
+TICKET_STAFF_ROLE_IDS = env_int_list("TICKET_STAFF_ROLE_ID")     # Reihenfolge für Pings
+TICKET_STAFF_ROLE_SET = frozenset(TICKET_STAFF_ROLE_IDS)         # für Staff-Checks (ohne Duplikate)
 
 UNMUTE_CHANNEL_ID = env_int("UNMUTE_CHANNEL_ID")
 
@@ -76,23 +93,33 @@ MARKET_POLAND_STAFF_ROLE_IDS = env_int_list("MARKET_POLAND_STAFF_ROLE_ID")
 MARKET_ALLOWED_ROLE_BERLIN = ROLE_GERMANY_ID
 MARKET_ALLOWED_ROLE_POLAND = ROLE_POLAND_ID
 
-MARKET_CFG = {
-    "berlin": {
-        "label": "Berlin",
-        "allowed_role_id": MARKET_ALLOWED_ROLE_BERLIN,
-        "panel_channel_id": MARKET_BERLIN_PANEL_CHANNEL_ID,
-        "listings_channel_id": MARKET_BERLIN_LISTINGS_CHANNEL_ID,
-        "staff_role_ids": MARKET_BERLIN_STAFF_ROLE_IDS,
-        "lang": "de",
-    },
-    "poland": {
-        "label": "Polska",
-        "allowed_role_id": MARKET_ALLOWED_ROLE_POLAND,
-        "panel_channel_id": MARKET_POLAND_PANEL_CHANNEL_ID,
-        "listings_channel_id": MARKET_POLAND_LISTINGS_CHANNEL_ID,
-        "staff_role_ids": MARKET_POLAND_STAFF_ROLE_IDS,
-        "lang": "pl",
-    }
+@dataclasses.dataclass(slots=True, frozen=True)
+class MarketRegion:
+    label: str
+    allowed_role_id: int
+    panel_channel_id: int
+    listings_channel_id: int
+    staff_role_ids: frozenset[int]
+    lang: str
+
+
+MARKET_CFG: dict[str, MarketRegion] = {
+    "berlin": MarketRegion(
+        label="Berlin",
+        allowed_role_id=MARKET_ALLOWED_ROLE_BERLIN,
+        panel_channel_id=MARKET_BERLIN_PANEL_CHANNEL_ID,
+        listings_channel_id=MARKET_BERLIN_LISTINGS_CHANNEL_ID,
+        staff_role_ids=frozenset(MARKET_BERLIN_STAFF_ROLE_IDS),
+        lang="de",
+    ),
+    "poland": MarketRegion(
+        label="Polska",
+        allowed_role_id=MARKET_ALLOWED_ROLE_POLAND,
+        panel_channel_id=MARKET_POLAND_PANEL_CHANNEL_ID,
+        listings_channel_id=MARKET_POLAND_LISTINGS_CHANNEL_ID,
+        staff_role_ids=frozenset(MARKET_POLAND_STAFF_ROLE_IDS),
+        lang="pl",
+    ),
 }
 
 if not TOKEN:
@@ -102,18 +129,26 @@ if not TOKEN:
 DB_PATH = os.path.join(BASE_DIR, "bot.sqlite3")
 
 
-def db():
+def _connect() -> sqlite3.Connection:
     # WAL + busy timeout: reduziert "database is locked"
-    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
+    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False, cached_statements=128, isolation_level=None)
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA synchronous=NORMAL;")
     conn.execute("PRAGMA busy_timeout=30000;")
+    conn.execute("PRAGMA temp_store=MEMORY;")
+    conn.execute("PRAGMA cache_size=-20000;")
+    conn.execute("PRAGMA cache_spill=OFF;")
+    conn.execute("PRAGMA mmap_size=268435456;")
+    return conn
 
+
+def _bootstrap_schema(conn: sqlite3.Connection):
+    # DDL genau einmal beim Start auf der Writer-Connection
     conn.execute("""
         CREATE TABLE IF NOT EXISTS mutes (
             guild_id INTEGER NOT NULL,
             user_id INTEGER NOT NULL,
-            unmute_at TEXT,
+            unmute_at INTEGER,
             PRIMARY KEY (guild_id, user_id)
         )
     """)
@@ -122,7 +157,7 @@ def db():
             guild_id INTEGER NOT NULL,
             user_id INTEGER NOT NULL,
             balance INTEGER NOT NULL DEFAULT 0,
-            last_daily TEXT,
+            last_daily INTEGER,
             PRIMARY KEY (guild_id, user_id)
         )
     """)
@@ -131,39 +166,266 @@ def db():
         CREATE TABLE IF NOT EXISTS mute_role_backup (
             guild_id INTEGER NOT NULL,
             user_id INTEGER NOT NULL,
-            role_ids TEXT NOT NULL,
+            role_ids BLOB NOT NULL,
             PRIMARY KEY (guild_id, user_id)
         )
     """)
-    return conn
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ticket_counter (
+            guild_id INTEGER PRIMARY KEY,
+            n INTEGER NOT NULL
+        )
+    """)
+
+
+# Eine langlebige Writer-Connection statt connect/close pro Operation (Schema läuft nur einmal)
+_CONN = _connect()
+_bootstrap_schema(_CONN)
+_DB_LOCK = threading.Lock()
+
+
+def _migrate_schema(conn: sqlite3.Connection):
+    # mutes.unmute_at: alte DBs speichern ISO-Text -> auf INTEGER (Unix-Sekunden) umstellen
+    cols = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(mutes)")}
+    if cols.get("unmute_at", "").upper() == "TEXT":
+        conn.executescript("""
+            BEGIN;
+            ALTER TABLE mutes RENAME TO mutes_old;
+            CREATE TABLE mutes (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                unmute_at INTEGER,
+                PRIMARY KEY (guild_id, user_id)
+            );
+            INSERT INTO mutes(guild_id, user_id, unmute_at)
+                SELECT guild_id, user_id, CAST(strftime('%s', unmute_at) AS INTEGER) FROM mutes_old;
+            DROP TABLE mutes_old;
+            COMMIT;
+        """)
+
+    # economy.last_daily: ISO-Text -> INTEGER (Unix-Sekunden)
+    cols = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(economy)")}
+    if cols.get("last_daily", "").upper() == "TEXT":
+        conn.executescript("""
+            BEGIN;
+            ALTER TABLE economy RENAME TO economy_old;
+            CREATE TABLE economy (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                balance INTEGER NOT NULL DEFAULT 0,
+                last_daily INTEGER,
+                PRIMARY KEY (guild_id, user_id)
+            );
+            INSERT INTO economy(guild_id, user_id, balance, last_daily)
+                SELECT guild_id, user_id, balance, CAST(strftime('%s', last_daily) AS INTEGER) FROM economy_old;
+            DROP TABLE economy_old;
+            COMMIT;
+        """)
+
+    # mute_role_backup.role_ids: "1,2,3"-Text -> gepackte little-endian u64 (BLOB)
+    cols = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(mute_role_backup)")}
+    if cols.get("role_ids", "").upper() == "TEXT":
+        packed = []
+        for guild_id, user_id, txt in conn.execute("SELECT guild_id, user_id, role_ids FROM mute_role_backup"):
+            ids = [int(p) for p in (txt or "").split(",") if p.strip().isdigit()]
+            packed.append((guild_id, user_id, struct.pack(f"<{len(ids)}Q", *ids)))
+        conn.execute("BEGIN")
+        conn.execute("DROP TABLE mute_role_backup")
+        conn.execute("""
+            CREATE TABLE mute_role_backup (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                role_ids BLOB NOT NULL,
+                PRIMARY KEY (guild_id, user_id)
+            )
+        """)
+        conn.executemany("INSERT INTO mute_role_backup(guild_id, user_id, role_ids) VALUES (?, ?, ?)", packed)
+        conn.execute("COMMIT")
+
+    # Teil-Index nur über befristete Mutes (deckt SQL_MUTE_TIMED ab); erst nach der Migration,
+    # weil die mutes-Tabelle dort ggf. neu angelegt wird
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_mutes_unmute_at ON mutes(unmute_at, guild_id, user_id) "
+        "WHERE unmute_at IS NOT NULL"
+    )
+
+
+_migrate_schema(_CONN)
+
+
+# SQL als Modul-Konstanten: gleiche Strings -> Treffer im Statement-Cache der Connection
+SQL_MUTE_SET = "INSERT OR REPLACE INTO mutes(guild_id, user_id, unmute_at) VALUES (?, ?, ?)"
+SQL_MUTE_DELETE = "DELETE FROM mutes WHERE guild_id=? AND user_id=?"
+SQL_MUTE_DELETE_EXPIRED = "DELETE FROM mutes WHERE guild_id=? AND user_id=? AND unmute_at=?"
+SQL_MUTE_TIMED = "SELECT guild_id, user_id, unmute_at FROM mutes WHERE unmute_at IS NOT NULL"
+SQL_TICKET_COUNTER_NEXT = (
+    "INSERT INTO ticket_counter(guild_id, n) VALUES (?, 1) "
+    "ON CONFLICT(guild_id) DO UPDATE SET n=n+1 RETURNING n"
+)
+SQL_TICKET_COUNTER_SEED = "UPDATE ticket_counter SET n=MAX(n, ?) WHERE guild_id=?"
+SQL_ROLE_BACKUP_SET = "INSERT OR REPLACE INTO mute_role_backup(guild_id, user_id, role_ids) VALUES (?, ?, ?)"
+SQL_ROLE_BACKUP_POP = "DELETE FROM mute_role_backup WHERE guild_id=? AND user_id=? RETURNING role_ids"
+SQL_ECON_GET = "SELECT balance, last_daily FROM economy WHERE guild_id=? AND user_id=?"
+SQL_ECON_DEBIT = "UPDATE economy SET balance=balance-? WHERE guild_id=? AND user_id=? AND balance>=?"
+SQL_ECON_CREDIT = (
+    "INSERT INTO economy(guild_id, user_id, balance, last_daily) VALUES (?, ?, ?, NULL) "
+    "ON CONFLICT(guild_id, user_id) DO UPDATE SET balance=balance+excluded.balance"
+)
+SQL_ECON_CLAIM_DAILY = (
+    "INSERT INTO economy(guild_id, user_id, balance, last_daily) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(guild_id, user_id) DO UPDATE SET balance=balance+excluded.balance, last_daily=excluded.last_daily "
+    "RETURNING balance"
+)
+
+
+# Reader-Pool: WAL erlaubt parallele Leser neben dem einen Writer -> Lesen wartet nicht auf _DB_LOCK
+DB_READERS = 4
+_READERS: queue.SimpleQueue[sqlite3.Connection] = queue.SimpleQueue()
+
+
+def _prime_statements(conn: sqlite3.Connection):
+    # Lese-Statements einmal ausführen -> liegen beim ersten echten Aufruf schon kompiliert im Cache
+    conn.execute(SQL_ECON_GET, (0, 0)).fetchall()
+
+
+for _ in range(DB_READERS):
+    _reader = _connect()
+    _reader.execute("PRAGMA query_only=ON;")
+    _prime_statements(_reader)
+    _READERS.put(_reader)
+
+
+@contextlib.contextmanager
+def _db_read():
+    conn = _READERS.get()
+    try:
+        yield conn
+    finally:
+        _READERS.put(conn)
+
+
+@contextlib.contextmanager
+def _db_tx():
+    # mehrere Statements in EINER Transaktion (ein Commit/fsync statt N)
+    with _DB_LOCK:
+        _CONN.execute("BEGIN IMMEDIATE")
+        try:
+            yield _CONN
+        except BaseException:
+            _CONN.execute("ROLLBACK")
+            raise
+        _CONN.execute("COMMIT")
+
+
+def mute_db_set(guild_id: int, user_id: int, unmute_at: int | None):
+    with _DB_LOCK:
+        _CONN.execute(
+            SQL_MUTE_SET,
+            (guild_id, user_id, unmute_at)
+        )
+
+
+def mute_db_delete(guild_id: int, user_id: int):
+    with _DB_LOCK:
+        _CONN.execute(SQL_MUTE_DELETE, (guild_id, user_id))
+
+
+def mute_db_delete_expired(rows: list[tuple[int, int, int]]):
+    # nur löschen, wenn unmute_at noch passt -> ein zwischenzeitliches Re-Mute bleibt stehen
+    if not rows:
+        return
+    with _db_tx() as conn:
+        conn.executemany(SQL_MUTE_DELETE_EXPIRED, rows)
+
+
+def mute_db_timed() -> list[tuple[int, int, int]]:
+    with _db_read() as conn:
+        return conn.execute(SQL_MUTE_TIMED).fetchall()
 
 
 # ==================== BOT ====================
 intents = discord.Intents.default()
 intents.members = True  # braucht "Server Members Intent" im Developer Portal
+# Events, die der Bot nie auswertet, gar nicht erst empfangen/dispatchen
+intents.typing = False
+intents.voice_states = False
+intents.presences = False
+intents.message_content = False
 
 bot = commands.Bot(command_prefix="!", intents=intents)
 discord.utils.setup_logging()
 
 # ==================== Invite Tracking ====================
-invite_cache = defaultdict(dict)  # guild_id -> {code: uses}
-vanity_cache = {}                # guild_id -> uses
-join_method_cache = {}           # (guild_id, user_id) -> dict(method=..., inviter=..., code=...)
+@dataclasses.dataclass(slots=True)
+class GuildInviteState:
+    # gesamter Invite-Tracking-Zustand einer Guild an einer Stelle (ein Dict-Lookup pro Join)
+    invites: dict[str, int] = dataclasses.field(default_factory=dict)  # code -> uses
+    vanity_uses: int = 0
+    refresh_lock: asyncio.Lock = dataclasses.field(default_factory=asyncio.Lock)
+    refreshed_at: float = float("-inf")
+
+
+invite_state: dict[int, GuildInviteState] = {}
+
+
+def invite_state_for(guild_id: int) -> GuildInviteState:
+    state = invite_state.get(guild_id)
+    if state is None:
+        state = invite_state[guild_id] = GuildInviteState()
+    return state
+
+# (guild_id, user_id) -> dict(method=..., code=..., inviter_id=..., inviter_mention=...)
+# begrenzt (LRU) und nur Strings/IDs, damit keine Member-Objekte ewig im Speicher hängen
+JOIN_METHOD_CACHE_MAX = 50_000
+join_method_cache: OrderedDict[tuple[int, int], dict] = OrderedDict()
+JOIN_METHOD_UNKNOWN = {"method": "unknown", "code": None, "inviter_id": None, "inviter_mention": None}
+
+
+def remember_join_method(guild_id: int, user_id: int, jm: dict):
+    key = (guild_id, user_id)
+    join_method_cache[key] = jm
+    join_method_cache.move_to_end(key)
+    if len(join_method_cache) > JOIN_METHOD_CACHE_MAX:
+        join_method_cache.popitem(last=False)
 
 # ==================== Helpers ====================
+# Color-Objekte einmal anlegen statt pro Embed
+COLOR_GREEN = discord.Color.green()
+COLOR_RED = discord.Color.red()
+COLOR_BLURPLE = discord.Color.blurple()
+COLOR_GOLD = discord.Color.gold()
+COLOR_ORANGE = discord.Color.orange()
+COLOR_DARK_GREY = discord.Color.dark_grey()
+
+_NOW = datetime.datetime.now
+_UTC = datetime.UTC
+_RNG = random.Random()  # eigene Instanz für /roll, /coinflip, /8ball, /daily
+
+
 def now_utc() -> datetime.datetime:
-    return datetime.datetime.now(datetime.UTC)
+    return _NOW(_UTC)
+
+
+_background_tasks: set[asyncio.Task] = set()
 
 
-async def get_text_channel(guild: discord.Guild, channel_id: int | None) -> discord.TextChannel | None:
+def spawn(coro) -> asyncio.Task:
+    # Fire-and-forget: Referenz halten, sonst kann der Task vom GC eingesammelt werden
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+def get_text_channel(guild: discord.Guild, channel_id: int | None) -> discord.TextChannel | None:
     if not channel_id:
         return None
     ch = guild.get_channel(channel_id)
     return ch if isinstance(ch, discord.TextChannel) else None
 
 
-async def get_log_channel(guild: discord.Guild) -> discord.TextChannel | None:
-    return await get_text_channel(guild, LOG_CHANNEL_ID)
+def get_log_channel(guild: discord.Guild) -> discord.TextChannel | None:
+    return get_text_channel(guild, LOG_CHANNEL_ID)
 
 
 async def send_log(
@@ -171,25 +433,29 @@ async def send_log(
     *,
     title: str,
     description: str = "",
-    color: discord.Color = discord.Color.blurple(),
+    color: discord.Color = COLOR_BLURPLE,
     fields: list[tuple[str, str, bool]] | None = None,
     user: discord.abc.User | None = None,
     file: discord.File | None = None,
 ):
-    log_ch = await get_log_channel(guild)
+    if not _LOG_ENABLED:
+        return
+    log_ch = get_log_channel(guild)
     if not log_ch:
         return
 
-    emb = discord.Embed(title=title, description=description, color=color, timestamp=now_utc())
+    # Embed direkt als Dict zusammensetzen (ein from_dict statt set_author + N add_field)
+    data = {"type": "rich", "title": title, "color": color.value, "timestamp": now_utc().isoformat()}
+    if description:
+        data["description"] = description
     if user is not None:
         try:
-            emb.set_author(name=str(user), icon_url=user.display_avatar.url)
+            data["author"] = {"name": str(user), "icon_url": user.display_avatar.url}
         except Exception:
-            emb.set_author(name=str(user))
-
+            data["author"] = {"name": str(user)}
     if fields:
-        for name, value, inline in fields:
-            emb.add_field(name=name, value=value or "—", inline=inline)
+        data["fields"] = [{"name": name, "value": value or "—", "inline": inline} for name, value, inline in fields]
+    emb = discord.Embed.from_dict(data)
 
     try:
         if file is not None:
@@ -201,16 +467,30 @@ async def send_log(
 
 
 def fmt_roles(member: discord.Member, limit: int = 18) -> str:
-    roles = [r.mention for r in member.roles if r.name != "@everyone"]
-    if not roles:
+    # member.roles[0] ist immer @everyone; Cache-Key nur aus den angezeigten IDs + Gesamtzahl
+    roles = member.roles
+    shown = tuple(r.id for r in itertools.islice(roles, 1, limit + 1))
+    return _fmt_role_ids(shown, len(roles) - 1)
+
+
+@functools.lru_cache(maxsize=1024)
+def _fmt_role_ids(shown: tuple[int, ...], total: int) -> str:
+    # Join-/Leave-Wellen haben meist dieselben (Auto-)Rollen -> String nur einmal bauen
+    if total <= 0:
         return "—"
-    if len(roles) > limit:
-        return " ".join(roles[:limit]) + f" …(+{len(roles)-limit})"
-    return " ".join(roles)
+    text = " ".join(f"<@&{rid}>" for rid in shown)
+    if total > len(shown):
+        return text + f" …(+{total-len(shown)})"
+    return text
+
+
+CREATED_FMT = "%d.%m.%Y %H:%M"
 
 
-def discord_account_age(member: discord.Member) -> str:
-    days = (now_utc() - member.created_at).days
+def discord_account_age(member: discord.Member, now_ts: float | None = None) -> str:
+    # Erstellzeit direkt aus der Snowflake-ID (ms seit Discord-Epoch) -> keine datetime-Objekte
+    created_ts = ((member.id >> 22) + discord.utils.DISCORD_EPOCH) / 1000
+    days = int(((now_ts if now_ts is not None else time.time()) - created_ts) // 86400)
     years = days // 365
     if years >= 1:
         return f"vor {years} Jahr(en)"
@@ -223,32 +503,21 @@ def discord_account_age(member: discord.Member) -> str:
 def has_role(member: discord.Member, role_id: int | None) -> bool:
     if not role_id:
         return False
-    r = member.guild.get_role(role_id)
-    return bool(r and r in member.roles)
+    # Binärsuche in den Rollen-IDs des Members statt guild.get_role + Scan über member.roles
+    return member.get_role(role_id) is not None
 
 
 def is_staff(member: discord.Member) -> bool:
     if member.guild_permissions.administrator:
         return True
-    if not TICKET_STAFF_ROLE_IDS:
-        return False
-    for rid in TICKET_STAFF_ROLE_IDS:
-        role = member.guild.get_role(rid)
-        if role and role in member.roles:
-            return True
-    return False
+    # member.get_role prüft per Binärsuche in den Rollen-IDs des Members (kein guild.get_role + Listen-Scan)
+    return any(member.get_role(rid) is not None for rid in TICKET_STAFF_ROLE_SET)
 
 
-def is_market_staff(member: discord.Member, staff_role_ids: list[int]) -> bool:
+def is_market_staff(member: discord.Member, staff_role_ids: frozenset[int]) -> bool:
     if member.guild_permissions.administrator:
         return True
-    if not staff_role_ids:
-        return False
-    for rid in staff_role_ids:
-        role = member.guild.get_role(rid)
-        if role and role in member.roles:
-            return True
-    return False
+    return any(member.get_role(rid) is not None for rid in staff_role_ids)
 
 
 def staff_check():
@@ -261,144 +530,198 @@ def staff_check():
     return app_commands.check(predicate)
 
 
+_inflight: dict[tuple[str, int], asyncio.Task] = {}
+
+
+def coalesced(key: tuple[str, int], factory) -> asyncio.Future:
+    # gleiche parallele REST-Calls (z.B. on_ready + on_guild_join) teilen sich EINEN Request
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(factory())
+        _inflight[key] = task
+        task.add_done_callback(lambda _t: _inflight.pop(key, None))
+    return asyncio.shield(task)
+
+
+def _sync_invite_cache(state: GuildInviteState, invites) -> discord.Invite | None:
+    # bestehendes Dict in-place aktualisieren statt pro Join neu aufzubauen;
+    # im selben Durchlauf das erste Invite merken, dessen Uses gestiegen sind
+    cache = state.invites
+    cache_get = cache.get
+    grown = None
+    seen = set()
+    seen_add = seen.add
+    for i in invites:
+        code = i.code
+        uses = i.uses or 0
+        if grown is None and uses > cache_get(code, 0):
+            grown = i
+        cache[code] = uses
+        seen_add(code)
+    for stale in cache.keys() - seen:
+        del cache[stale]
+    return grown
+
+
+INVITE_REFRESH_CONCURRENCY = 20
+INVITE_REFRESH_TTL = 30  # Sekunden: on_ready + on_guild_join direkt hintereinander -> nur ein Refresh
+
+
 async def refresh_invites_for_guild(guild: discord.Guild):
-    try:
-        invites = await guild.invites()
-        invite_cache[guild.id] = {i.code: (i.uses or 0) for i in invites}
-    except discord.Forbidden:
-        invite_cache[guild.id] = {}
+    if not _LOG_ENABLED:
+        return  # Invite-Tracking landet nur im Log
+    state = invite_state_for(guild.id)
+    async with state.refresh_lock:
+        if time.monotonic() - state.refreshed_at < INVITE_REFRESH_TTL:
+            return
+        state.refreshed_at = time.monotonic()
 
-    try:
-        v = await guild.vanity_invite()
-        vanity_cache[guild.id] = (v.uses if v else 0)
-    except discord.Forbidden:
-        vanity_cache[guild.id] = vanity_cache.get(guild.id, 0)
-    except discord.HTTPException:
-        pass
+        try:
+            invites = await coalesced(("invites", guild.id), guild.invites)
+            _sync_invite_cache(state, invites)
+        except discord.Forbidden:
+            state.invites.clear()
+
+        try:
+            v = await coalesced(("vanity", guild.id), guild.vanity_invite)
+            state.vanity_uses = (v.uses if v else 0)
+        except discord.HTTPException:
+            pass
 
 
 async def detect_join_method(guild: discord.Guild) -> dict:
     used_code = None
     inviter = None
+    state = invite_state_for(guild.id)
 
     try:
+        # pro Join frisch holen: ein geteilter Request würde parallele Joins falsch zuordnen
         new_invites = await guild.invites()
-        old = invite_cache.get(guild.id, {})
-        for inv in new_invites:
-            before = old.get(inv.code, 0)
-            uses = inv.uses or 0
-            if uses > before:
-                used_code = inv.code
-                inviter = inv.inviter
-                break
-        invite_cache[guild.id] = {i.code: (i.uses or 0) for i in new_invites}
+        grown = _sync_invite_cache(state, new_invites)
+        if grown is not None:
+            used_code = grown.code
+            inviter = grown.inviter
     except discord.Forbidden:
         pass
 
     if used_code:
-        return {"method": "invite", "code": used_code, "inviter": inviter}
+        return {
+            "method": "invite",
+            "code": used_code,
+            "inviter_id": inviter.id if inviter else None,
+            "inviter_mention": inviter.mention if inviter else None,
+        }
 
     try:
         v = await guild.vanity_invite()
         new_uses = (v.uses if v else 0)
-        old_uses = vanity_cache.get(guild.id, 0)
-        vanity_cache[guild.id] = new_uses
+        old_uses = state.vanity_uses
+        state.vanity_uses = new_uses
         if new_uses > old_uses:
-            return {"method": "vanity", "code": None, "inviter": None}
+            return {"method": "vanity", "code": None, "inviter_id": None, "inviter_mention": None}
     except (discord.Forbidden, discord.HTTPException):
         pass
 
-    return {"method": "unknown", "code": None, "inviter": None}
+    return JOIN_METHOD_UNKNOWN
+
+
+_TOPIC_RE = re.compile(r"([^|=]+)=([^|]*)")
 
 
 def parse_topic(topic: str | None) -> dict:
-    data = {}
+    # "k=v | k2=v2" in einem Regex-Durchlauf statt split/split/strip pro Teil
     if not topic:
-        return data
-    parts = [p.strip() for p in topic.split("|")]
-    for p in parts:
-        if "=" in p:
-            k, v = p.split("=", 1)
-            data[k.strip()] = v.strip()
-    return data
-
-
-async def build_text_channel_transcript(channel: discord.TextChannel, limit: int = 200) -> str:
-    lines: list[str] = []
-    lines.append(f"Transcript for #{channel.name} ({channel.id})")
-    lines.append(f"Guild: {channel.guild.name} ({channel.guild.id})")
-    lines.append(f"Exported at: {now_utc().isoformat()} UTC")
+        return {}
+    return {k.strip(): v.strip() for k, v in _TOPIC_RE.findall(topic)}
+
+
+_CLAIM_RE = re.compile(r"claimed_by=([^|]*)")
+_CLAIMED_SEG_RE = re.compile(r"claimed_by=[^|\s]*")
+
+
+def topic_claimed_by(topic: str | None) -> str | None:
+    # nur claimed_by gebraucht -> ein Regex-Search statt komplettem parse_topic
+    if not topic:
+        return None
+    m = _CLAIM_RE.search(topic)
+    return m.group(1).strip() if m else None
+
+
+_TOPIC_UID_RE = re.compile(r"\buser_id=\s*(\d+)")
+
+
+def topic_owner_id(topic: str | None) -> int:
+    # nur user_id gebraucht -> ein Regex-Search statt parse_topic + int-Cast
+    m = _TOPIC_UID_RE.search(topic) if topic else None
+    return int(m.group(1)) if m else 0
+
+
+async def build_text_channel_transcript(channel: discord.TextChannel, limit: int = 200) -> io.BytesIO:
+    # Zeilen direkt UTF-8 in den Buffer schreiben (keine Liste + join + encode)
+    buf = io.BytesIO()
+
+    def w(line: str):
+        buf.write(line.encode("utf-8"))
+        buf.write(b"\n")
+
+    w(f"Transcript for #{channel.name} ({channel.id})")
+    w(f"Guild: {channel.guild.name} ({channel.guild.id})")
+    w(f"Exported at: {now_utc().isoformat()} UTC")
     if channel.topic:
-        lines.append(f"Topic: {channel.topic}")
-    lines.append("-" * 80)
+        w(f"Topic: {channel.topic}")
+    w("-" * 80)
 
     try:
+        # History ist cursor-basiert (after=letzte ID) -> Seiten koennen nicht parallel geholt werden
         async for msg in channel.history(limit=limit, oldest_first=True):
-            ts = msg.created_at.strftime("%Y-%m-%d %H:%M:%S UTC")
-            author = f"{msg.author} ({msg.author.id})"
             content = (msg.content or "").replace("\n", "\\n")
-            lines.append(f"[{ts}] {author}: {content}")
+            w(f"[{msg.created_at:%Y-%m-%d %H:%M:%S} UTC] {msg.author} ({msg.author.id}): {content}")
             for a in msg.attachments:
-                lines.append(f"  [Attachment] {a.url}")
+                w(f"  [Attachment] {a.url}")
     except Exception as e:
-        lines.append(f"[Transcript error] {e}")
+        w(f"[Transcript error] {e}")
 
-    lines.append("-" * 80)
-    return "\n".join(lines)
+    buf.write(b"-" * 80)
+    buf.seek(0)
+    return buf
 
 
 # ==================== Mute Role Backup Helpers ====================
-def _serialize_role_ids(role_ids: list[int]) -> str:
-    return ",".join(str(r) for r in role_ids)
+# Rollen-IDs als gepackte u64 (8 Byte pro ID) statt "1,2,3"-String -> kein int<->str pro Rolle
+def _serialize_role_ids(role_ids: list[int]) -> bytes:
+    return struct.pack(f"<{len(role_ids)}Q", *role_ids)
 
 
-def _deserialize_role_ids(s: str) -> list[int]:
-    out: list[int] = []
-    for part in (s or "").split(","):
-        part = part.strip()
-        if part.isdigit():
-            out.append(int(part))
-    return out
+def _deserialize_role_ids(blob: bytes) -> list[int]:
+    return list(struct.unpack(f"<{len(blob) // 8}Q", blob))
 
 
 def save_mute_roles_backup(guild_id: int, user_id: int, role_ids: list[int]):
-    conn = db()
-    try:
-        conn.execute(
-            "INSERT OR REPLACE INTO mute_role_backup(guild_id, user_id, role_ids) VALUES (?, ?, ?)",
-            (guild_id, user_id, _serialize_role_ids(role_ids))
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    with _DB_LOCK:
+        _CONN.execute(SQL_ROLE_BACKUP_SET, (guild_id, user_id, _serialize_role_ids(role_ids)))
 
 
 def pop_mute_roles_backup(guild_id: int, user_id: int) -> list[int]:
-    conn = db()
-    try:
-        row = conn.execute(
-            "SELECT role_ids FROM mute_role_backup WHERE guild_id=? AND user_id=?",
-            (guild_id, user_id)
-        ).fetchone()
-        conn.execute(
-            "DELETE FROM mute_role_backup WHERE guild_id=? AND user_id=?",
-            (guild_id, user_id)
-        )
-        conn.commit()
-        if not row:
-            return []
-        return _deserialize_role_ids(row[0])
-    finally:
-        conn.close()
+    # DELETE ... RETURNING: ein Statement, atomar -> ein paralleles Unmute bekommt das Backup nicht doppelt
+    with _DB_LOCK:
+        rows = _CONN.execute(SQL_ROLE_BACKUP_POP, (guild_id, user_id)).fetchall()
+    if not rows:
+        return []
+    return _deserialize_role_ids(rows[0][0])
 
 
-def can_bot_manage_role(guild: discord.Guild, role: discord.Role) -> bool:
+def bot_top_role(guild: discord.Guild) -> discord.Role | None:
+    # me.top_role ist ein max() über alle Rollen des Bots -> einmal vor der Schleife holen
+    me = guild.me
+    return me.top_role if me else None
+
+
+def can_bot_manage_role(role: discord.Role, bot_top: discord.Role | None) -> bool:
     if role.is_default() or role.managed:
         return False
-    me = guild.me
-    if not me:
+    if bot_top is None:
         return False
-    return me.top_role > role
+    return bot_top > role
 
 
 # ==================== Ticket Helpers ====================
@@ -411,23 +734,159 @@ async def ensure_ticket_category(guild: discord.Guild) -> discord.CategoryChanne
     return cat
 
 
+def ticket_counter_next(guild_id: int) -> int:
+    with _DB_LOCK:
+        row = _CONN.execute(SQL_TICKET_COUNTER_NEXT, (guild_id,)).fetchone()
+    return int(row[0])
+
+
+def ticket_counter_seed(guild_id: int, n: int):
+    with _DB_LOCK:
+        _CONN.execute(SQL_TICKET_COUNTER_SEED, (n, guild_id))
+
+
+# Overwrites sind reine Werte-Objekte -> einmal bauen, pro Ticket nur das Mapping neu
+TICKET_OW_HIDDEN = discord.PermissionOverwrite(view_channel=False)
+TICKET_OW_MEMBER = discord.PermissionOverwrite(view_channel=True, send_messages=True, read_message_history=True)
+TICKET_OW_BOT = discord.PermissionOverwrite(view_channel=True, send_messages=True, manage_channels=True, read_message_history=True)
+
+_staff_roles_cache: dict[int, tuple[list[discord.Role], str]] = {}  # guild_id -> (Staff-Rollen, Ping-String)
+
+
+def ticket_staff_roles(guild: discord.Guild) -> tuple[list[discord.Role], str]:
+    # Role-Objekte werden von discord.py in-place aktualisiert -> nur bei Rollen-Löschung verwerfen
+    cached = _staff_roles_cache.get(guild.id)
+    if cached is None:
+        roles = [r for r in (guild.get_role(rid) for rid in TICKET_STAFF_ROLE_IDS) if r is not None]
+        cached = (roles, " ".join(r.mention for r in roles))
+        _staff_roles_cache[guild.id] = cached
+    return cached
+
+
+ticket_index = defaultdict(dict)  # guild_id -> {user_id: channel_id} (offene Tickets)
+ticket_owners: dict[int, int] = {}  # channel_id -> owner user_id (Umkehrung von ticket_index, für on_message)
+
+# Max. gleichzeitige Ticket-Erstellungen pro Guild (Button-Spam -> sonst 429er)
+TICKET_CREATE_CONCURRENCY = 3
+TICKET_CREATE_SEMA: dict[int, asyncio.Semaphore] = {}
+
+
+def index_ticket_channels(guild: discord.Guild):
+    # einmaliger Scan der Ticket-Kategorie (Startup / Guild-Join), danach pflegen create/delete den Index
+    cat = guild.get_channel(TICKET_CATEGORY_ID) if TICKET_CATEGORY_ID else None
+    if not isinstance(cat, discord.CategoryChannel):
+        return
+    idx = ticket_index[guild.id]
+    for ch_id in idx.values():
+        ticket_owners.pop(ch_id, None)
+    idx.clear()
+    for ch in cat.text_channels:
+        owner_id = topic_owner_id(ch.topic)
+        if owner_id:
+            idx[owner_id] = ch.id
+            ticket_owners[ch.id] = owner_id
+
+
 async def next_ticket_number(guild: discord.Guild) -> int:
-    n = 1
-    existing = {c.name for c in guild.text_channels}
-    while f"ticket-{n}" in existing:
-        n += 1
+    n = await asyncio.to_thread(ticket_counter_next, guild.id)
+    if n == 1:
+        # erster Zähler für diese Guild: einmalig an bestehende ticket-N Channels anschließen
+        highest = 0
+        for c in guild.text_channels:
+            suffix = c.name[7:] if c.name.startswith("ticket-") else ""
+            if suffix.isdigit():
+                highest = max(highest, int(suffix))
+        if highest:
+            n = highest + 1
+            await asyncio.to_thread(ticket_counter_seed, guild.id, n)
     return n
 
 
 # ==================== Mute System ====================
 MUTED_ROLE_NAME = "Muted"
+MUTE_OVERWRITE_CONCURRENCY = 5
+
+# Ziel-Werte für die Muted-Overwrites, einmal gebaut (andere Flags der Rolle bleiben unangetastet)
+MUTE_OW_CHANNEL = dict(
+    view_channel=False,
+    send_messages=False,
+    add_reactions=False,
+    send_messages_in_threads=False,
+    create_public_threads=False,
+    create_private_threads=False,
+    read_message_history=True,
+)
+MUTE_OW_UNMUTE_CHANNEL = {**MUTE_OW_CHANNEL, "view_channel": True, "send_messages": True}
+
+_MUTE_DM_TEMPLATE = (
+    "🔇 Du wurdest auf **{guild}** gemutet.\n"
+    "👮 Von: {mod}\n"
+    "📝 Grund: {grund}\n"
+    "⏳ Dauer: {dauer}\n\n"
+    "✅ Du kannst **nur** im **{hint}** schreiben (für Unmute) "
+    "und **in deinen eigenen Ticket-Channels**."
+)
+
+_unmute_hint_cache: dict[int, str] = {}  # guild_id -> "#channel-name" für die Mute-DM
+
+
+def unmute_hint(guild: discord.Guild) -> str:
+    hint = _unmute_hint_cache.get(guild.id)
+    if hint is None:
+        ch = guild.get_channel(UNMUTE_CHANNEL_ID) if UNMUTE_CHANNEL_ID else None
+        if not isinstance(ch, discord.TextChannel):
+            # Fallback nicht cachen -> Channel, der später angelegt wird, wird gefunden
+            return "den Unmute-Channel"
+        hint = _unmute_hint_cache[guild.id] = f"#{ch.name}"
+    return hint
 
 
-async def get_or_create_muted_role(guild: discord.Guild) -> discord.Role:
+_muted_role_cache: dict[int, int] = {}  # guild_id -> role_id der Muted-Rolle
+# (guild_id, user_id) aller Member mit Muted-Rolle -> on_message prüft zuerst nur diesen Set
+_muted_users: set[tuple[int, int]] = set()
+
+
+def index_muted_members(guild: discord.Guild):
+    role = muted_role_for(guild)
+    if role:
+        _muted_users.update((guild.id, m.id) for m in role.members)
+
+
+def forget_muted_guild(guild_id: int):
+    # Muted-Rolle gelöscht/umbenannt -> Einträge der Guild verwerfen
+    _muted_users.difference_update([k for k in _muted_users if k[0] == guild_id])
+
+
+def muted_role_for(guild: discord.Guild) -> discord.Role | None:
+    # Namenssuche über alle Rollen nur beim ersten Mal, danach get_role per ID
+    rid = _muted_role_cache.get(guild.id)
+    role = guild.get_role(rid) if rid else None
+    if role:
+        return role
     role = discord.utils.get(guild.roles, name=MUTED_ROLE_NAME)
+    if role:
+        _muted_role_cache[guild.id] = role.id
+    return role
+
+
+async def get_or_create_muted_role(guild: discord.Guild) -> discord.Role:
+    role = muted_role_for(guild)
     if role:
         return role
-    return await guild.create_role(name=MUTED_ROLE_NAME, reason="Mute-System: Muted Rolle erstellt")
+    role = await guild.create_role(name=MUTED_ROLE_NAME, reason="Mute-System: Muted Rolle erstellt")
+    _muted_role_cache[guild.id] = role.id
+    return role
+
+
+# (guild_id, role_id) -> Overwrites in allen Text-Channels vollständig gesetzt;
+# ungültig bei neuen Channels / geänderten Overwrites (siehe Events)
+_mute_overwrites_ok: set[tuple[int, int]] = set()
+
+
+async def ensure_mute_overwrites(guild: discord.Guild, muted_role: discord.Role):
+    if (guild.id, muted_role.id) in _mute_overwrites_ok:
+        return
+    await apply_mute_overwrites(guild, muted_role)
 
 
 async def apply_mute_overwrites(guild: discord.Guild, muted_role: discord.Role):
@@ -437,26 +896,27 @@ async def apply_mute_overwrites(guild: discord.Guild, muted_role: discord.Role):
     if not isinstance(unmute_ch, discord.TextChannel):
         raise RuntimeError("UNMUTE_CHANNEL_ID Channel nicht gefunden.")
 
-    for ch in guild.text_channels:
-        ow = ch.overwrites_for(muted_role)
+    # parallel statt seriell, aber begrenzt (Rate-Limits)
+    sem = asyncio.Semaphore(MUTE_OVERWRITE_CONCURRENCY)
 
-        ow.view_channel = False
-        ow.send_messages = False
-        ow.add_reactions = False
-        ow.send_messages_in_threads = False
-        ow.create_public_threads = False
-        ow.create_private_threads = False
-        ow.read_message_history = True
+    async def _apply_one(ch: discord.TextChannel):
+        current = ch.overwrites_for(muted_role)
+        ow = discord.PermissionOverwrite.from_pair(*current.pair())
+        ow.update(**(MUTE_OW_UNMUTE_CHANNEL if ch.id == unmute_ch.id else MUTE_OW_CHANNEL))
 
-        if ch.id == unmute_ch.id:
-            ow.view_channel = True
-            ow.send_messages = True
-            ow.read_message_history = True
+        if ow == current:
+            return True  # schon korrekt -> kein REST-Call
 
-        try:
-            await ch.set_permissions(muted_role, overwrite=ow, reason="Mute-System Overwrites aktualisiert")
-        except discord.Forbidden:
-            pass
+        async with sem:
+            try:
+                await ch.set_permissions(muted_role, overwrite=ow, reason="Mute-System Overwrites aktualisiert")
+            except discord.Forbidden:
+                return False
+        return True
+
+    results = await asyncio.gather(*(_apply_one(ch) for ch in guild.text_channels), return_exceptions=True)
+    if all(res is True for res in results):
+        _mute_overwrites_ok.add((guild.id, muted_role.id))
 
 
 # ==================== Role Panel ====================
@@ -479,13 +939,13 @@ class RolePanelView(discord.ui.View):
             if role in member.roles:
                 await member.remove_roles(role, reason="Role Panel toggle")
                 await interaction.response.send_message(f"❌ Rolle entfernt: {role.mention}", ephemeral=True)
-                await send_log(interaction.guild, title="➖ Rolle entfernt (Panel)", color=discord.Color.red(),
-                               user=member, fields=[("Rolle", role.mention, True)])
+                spawn(send_log(interaction.guild, title="➖ Rolle entfernt (Panel)", color=COLOR_RED,
+                               user=member, fields=[("Rolle", role.mention, True)]))
             else:
                 await member.add_roles(role, reason="Role Panel toggle")
                 await interaction.response.send_message(f"✅ Rolle bekommen: {role.mention}", ephemeral=True)
-                await send_log(interaction.guild, title="➕ Rolle hinzugefügt (Panel)", color=discord.Color.green(),
-                               user=member, fields=[("Rolle", role.mention, True)])
+                spawn(send_log(interaction.guild, title="➕ Rolle hinzugefügt (Panel)", color=COLOR_GREEN,
+                               user=member, fields=[("Rolle", role.mention, True)]))
         except discord.Forbidden:
             await interaction.response.send_message("❌ Ich habe keine Rechte Rollen zu vergeben.", ephemeral=True)
 
@@ -498,26 +958,63 @@ class RolePanelView(discord.ui.View):
         await self._toggle_role(interaction, ROLE_GERMANY_ID)
 
 
+async def log_ticket_transcript(ch: discord.TextChannel, closer: discord.Member):
+    transcript = await build_text_channel_transcript(ch, limit=TRANSCRIPT_LIMIT)
+    f = discord.File(fp=transcript, filename=f"{ch.name}-transcript.txt")
+
+    await send_log(
+        ch.guild,
+        title="🔒 Ticket geschlossen",
+        color=COLOR_RED,
+        user=closer,
+        fields=[("Channel", f"#{ch.name} (`{ch.id}`)", False),
+                ("Closed by", f"{closer.mention} (`{closer.id}`)", False)],
+        file=f,
+    )
+
+
+async def finish_ticket_close(ch: discord.TextChannel, closer: discord.Member):
+    # läuft als Hintergrund-Task: Interaction ist sofort fertig, Transcript/Log/Delete danach
+    # ohne Log-Channel landet das Transcript nirgends -> History gar nicht erst laden
+    if _LOG_ENABLED:
+        # Transcript + Log laufen während der 5s Wartezeit statt davor
+        await asyncio.gather(log_ticket_transcript(ch, closer), asyncio.sleep(5))
+    else:
+        await asyncio.sleep(5)
+    try:
+        await ch.delete(reason=f"Ticket geschlossen von {closer}")
+    except discord.Forbidden:
+        pass
+
+
 # ==================== Ticket Views ====================
 class TicketManageView(discord.ui.View):
     def __init__(self, ticket_owner_id: int):
         super().__init__(timeout=None)
         self.ticket_owner_id = ticket_owner_id
 
-    async def _update_status_embed(self, channel: discord.TextChannel, status_text: str):
-        me = channel.guild.me
-        async for msg in channel.history(limit=25):
-            if me and msg.author.id == me.id and msg.embeds:
-                emb = msg.embeds[0]
-                if len(emb.fields) >= 2:
-                    emb.set_field_at(1, name="Status", value=status_text, inline=False)
-                else:
-                    emb.add_field(name="Status", value=status_text, inline=False)
-                try:
-                    await msg.edit(embed=emb, view=self)
-                except Exception:
-                    pass
-                break
+    async def _update_status_embed(self, channel: discord.TextChannel, status_text: str,
+                                   status_msg: discord.Message | None = None):
+        # Status-Embed ist die Nachricht, an der die Buttons hängen -> kein history()-Scan nötig
+        msg = status_msg if status_msg is not None and status_msg.embeds else None
+        if msg is None:
+            me = channel.guild.me
+            async for m in channel.history(limit=25):
+                if me and m.author.id == me.id and m.embeds:
+                    msg = m
+                    break
+        if msg is None:
+            return
+
+        emb = msg.embeds[0]
+        if len(emb.fields) >= 2:
+            emb.set_field_at(1, name="Status", value=status_text, inline=False)
+        else:
+            emb.add_field(name="Status", value=status_text, inline=False)
+        try:
+            await msg.edit(embed=emb, view=self)
+        except discord.HTTPException:
+            pass
 
     @discord.ui.button(label="Close Ticket", style=discord.ButtonStyle.danger, emoji="🔒", custom_id="ticket:close")
     async def close_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -532,25 +1029,7 @@ class TicketManageView(discord.ui.View):
             return await interaction.response.send_message("❌ Du darfst dieses Ticket nicht schließen.", ephemeral=True)
 
         await interaction.response.send_message("🔒 Ticket wird in **5 Sekunden** geschlossen…", ephemeral=True)
-
-        transcript = await build_text_channel_transcript(ch, limit=TRANSCRIPT_LIMIT)
-        f = discord.File(fp=io.BytesIO(transcript.encode("utf-8")), filename=f"{ch.name}-transcript.txt")
-
-        await send_log(
-            interaction.guild,
-            title="🔒 Ticket geschlossen",
-            color=discord.Color.red(),
-            user=interaction.user,
-            fields=[("Channel", f"#{ch.name} (`{ch.id}`)", False),
-                    ("Closed by", f"{interaction.user.mention} (`{interaction.user.id}`)", False)],
-            file=f,
-        )
-
-        await asyncio.sleep(5)
-        try:
-            await ch.delete(reason=f"Ticket geschlossen von {interaction.user}")
-        except discord.Forbidden:
-            pass
+        spawn(finish_ticket_close(ch, interaction.user))
 
     @discord.ui.button(label="Claim Ticket", style=discord.ButtonStyle.success, emoji="🧾", custom_id="ticket:claim")
     async def claim_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -563,36 +1042,29 @@ class TicketManageView(discord.ui.View):
         if not isinstance(ch, discord.TextChannel):
             return await interaction.response.send_message("Ungültiger Channel.", ephemeral=True)
 
-        topic_data = parse_topic(ch.topic)
-        if topic_data.get("claimed_by") and topic_data.get("claimed_by") != "none":
+        claimed_by = topic_claimed_by(ch.topic)
+        if claimed_by and claimed_by != "none":
             return await interaction.response.send_message("✅ Dieses Ticket ist bereits geclaimt.", ephemeral=True)
 
-        new_topic = (ch.topic or "")
-        if "claimed_by=" in new_topic:
-            parts = [p.strip() for p in new_topic.split("|")]
-            fixed = []
-            for p in parts:
-                if p.startswith("claimed_by="):
-                    fixed.append(f"claimed_by={interaction.user.id}")
-                else:
-                    fixed.append(p)
-            new_topic = " | ".join(fixed)
-        else:
-            new_topic = (new_topic + " | " if new_topic else "") + f"claimed_by={interaction.user.id}"
+        # claimed_by-Segment in einem Durchlauf ersetzen, sonst anhängen
+        claim_seg = f"claimed_by={interaction.user.id}"
+        new_topic, n = _CLAIMED_SEG_RE.subn(claim_seg, ch.topic or "", count=1)
+        if not n:
+            new_topic = (new_topic + " | " if new_topic else "") + claim_seg
 
         await ch.edit(topic=new_topic, reason="Ticket geclaimt")
-        await self._update_status_embed(ch, f"🟢 Geclaimt von {interaction.user.mention}")
+        await self._update_status_embed(ch, f"🟢 Geclaimt von {interaction.user.mention}", interaction.message)
 
         await interaction.response.send_message(f"🧾 Ticket geclaimt von {interaction.user.mention}", ephemeral=False)
 
-        await send_log(
+        spawn(send_log(
             interaction.guild,
             title="🧾 Ticket geclaimt",
-            color=discord.Color.gold(),
+            color=COLOR_GOLD,
             user=interaction.user,
             fields=[("Channel", f"{ch.mention} (`{ch.id}`)", False),
                     ("Claimed by", f"{interaction.user.mention} (`{interaction.user.id}`)", False)],
-        )
+        ))
 
 
 class TicketOpenView(discord.ui.View):
@@ -608,58 +1080,67 @@ class TicketOpenView(discord.ui.View):
 
         try:
             category = await ensure_ticket_category(guild)
-        except Exception as e:
+        except RuntimeError as e:
             return await interaction.response.send_message(f"❌ {e}", ephemeral=True)
 
-        # already has ticket (nur in der Ticket-Kategorie iterieren)
-        for ch in category.text_channels:
-            if ch.topic and f"user_id={member.id}" in ch.topic:
-                return await interaction.response.send_message(f"Du hast bereits ein Ticket: {ch.mention}", ephemeral=True)
-
-        ticket_no = await next_ticket_number(guild)
-        channel_name = f"ticket-{ticket_no}"
-
-        overwrites = {
-            guild.default_role: discord.PermissionOverwrite(view_channel=False),
-            member: discord.PermissionOverwrite(view_channel=True, send_messages=True, read_message_history=True),
-            guild.me: discord.PermissionOverwrite(view_channel=True, send_messages=True, manage_channels=True, read_message_history=True),
-        }
-
-        staff_roles = [guild.get_role(rid) for rid in TICKET_STAFF_ROLE_IDS]
-        staff_roles = [r for r in staff_roles if r is not None]
-        for r in staff_roles:
-            overwrites[r] = discord.PermissionOverwrite(view_channel=True, send_messages=True, read_message_history=True)
-
-        topic = f"ticket_type={kind} | user_id={member.id} | claimed_by=none"
-        ch = await guild.create_text_channel(
-            name=channel_name,
-            category=category,
-            overwrites=overwrites,
-            topic=topic,
-            reason=f"Ticket erstellt von {member} ({kind})"
-        )
-
-        embed = discord.Embed(
-            title="Tickets",
-            description=f"{member.mention} created a new **{emoji} {kind}** ticket.",
-            color=discord.Color.dark_grey()
-        )
-        embed.add_field(name="User", value=f"{member} (`{member.id}`)", inline=False)
-        embed.add_field(name="Status", value="🟡 Open (not claimed)", inline=False)
-        embed.set_thumbnail(url=member.display_avatar.url)
+        sem = TICKET_CREATE_SEMA.get(guild.id)
+        if sem is None:
+            sem = TICKET_CREATE_SEMA[guild.id] = asyncio.Semaphore(TICKET_CREATE_CONCURRENCY)
+        # vor dem Warten auf die Semaphore bestätigen, sonst laufen gestaute Klicks ins 3s-Limit
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        async with sem:
+            # already has ticket (Index statt Channel-Scan)
+            existing_id = ticket_index[guild.id].get(member.id)
+            if existing_id:
+                existing = guild.get_channel(existing_id)
+                if existing:
+                    return await interaction.followup.send(f"Du hast bereits ein Ticket: {existing.mention}", ephemeral=True)
+                ticket_index[guild.id].pop(member.id, None)
+                ticket_owners.pop(existing_id, None)
+
+            ticket_no = await next_ticket_number(guild)
+            channel_name = f"ticket-{ticket_no}"
+
+            overwrites = {
+                guild.default_role: TICKET_OW_HIDDEN,
+                member: TICKET_OW_MEMBER,
+                guild.me: TICKET_OW_BOT,
+            }
+
+            staff_roles, staff_ping = ticket_staff_roles(guild)
+            for r in staff_roles:
+                overwrites[r] = TICKET_OW_MEMBER
+
+            topic = f"ticket_type={kind} | user_id={member.id} | claimed_by=none"
+            ch = await guild.create_text_channel(
+                name=channel_name,
+                category=category,
+                overwrites=overwrites,
+                topic=topic,
+                reason=f"Ticket erstellt von {member} ({kind})"
+            )
+            ticket_index[guild.id][member.id] = ch.id
+            ticket_owners[ch.id] = member.id
 
-        staff_ping = " ".join(r.mention for r in staff_roles)
+            embed = discord.Embed(
+                title="Tickets",
+                description=f"{member.mention} created a new **{emoji} {kind}** ticket.",
+                color=COLOR_DARK_GREY
+            )
+            embed.add_field(name="User", value=f"{member} (`{member.id}`)", inline=False)
+            embed.add_field(name="Status", value="🟡 Open (not claimed)", inline=False)
+            embed.set_thumbnail(url=member.display_avatar.url)
 
-        await ch.send(content=staff_ping, embed=embed, view=TicketManageView(ticket_owner_id=member.id))
-        await interaction.response.send_message(f"✅ Ticket erstellt: {ch.mention}", ephemeral=True)
+            await ch.send(content=staff_ping, embed=embed, view=TicketManageView(ticket_owner_id=member.id))
+        await interaction.followup.send(f"✅ Ticket erstellt: {ch.mention}", ephemeral=True)
 
-        await send_log(
+        spawn(send_log(
             guild,
             title="🎫 Ticket erstellt",
-            color=discord.Color.green(),
+            color=COLOR_GREEN,
             user=member,
             fields=[("Channel", f"{ch.mention} (`{ch.id}`)", False), ("Typ", kind, True)],
-        )
+        ))
 
     @discord.ui.button(label="Question", style=discord.ButtonStyle.secondary, emoji="❓", custom_id="ticket_open:question")
     async def question(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -675,29 +1156,143 @@ class TicketOpenView(discord.ui.View):
 
 
 # ==================== MARKET (kein Thread, kein extra Channel) ====================
-def market_meta(seller_id: int, region_key: str, claimed_by: int | None) -> str:
+# Texte je Sprache einmal festlegen -> pro Interaktion ein Dict-Lookup statt Ternary-Ketten
+MSG = {
+    ("de", "seller_self"): "❌ Du bist der Verkäufer.",
+    ("pl", "seller_self"): "❌ Jesteś sprzedawcą.",
+    ("de", "contact_text"): "📩 {buyer} möchte den Verkäufer {seller} kontaktieren. Bitte per DM klären.",
+    ("pl", "contact_text"): "📩 {buyer} chce skontaktować się ze sprzedawcą {seller}. Napiszcie do siebie na DM i dogadajcie się.",
+    ("de", "contact_ok"): "✅ Kontakt gepingt.",
+    ("pl", "contact_ok"): "✅ Wysłano ping kontaktowy.",
+    ("de", "claim_seller"): "❌ Verkäufer kann nicht claimen.",
+    ("pl", "claim_seller"): "❌ Sprzedawca nie może zająć.",
+    ("de", "claim_role"): "❌ Du hast nicht die passende Rolle für diesen Markt.",
+    ("pl", "claim_role"): "❌ Nie masz odpowiedniej roli do tego rynku.",
+    ("de", "claim_taken"): "✅ Bereits geclaimt.",
+    ("pl", "claim_taken"): "✅ Ogłoszenie jest już zajęte.",
+    ("de", "claim_status"): "🟢 Geclaimt von {buyer}",
+    ("pl", "claim_status"): "🟢 Zajęte przez {buyer}",
+    ("de", "claim_ok"): "✅ Geclaimt.",
+    ("pl", "claim_ok"): "✅ Zajęte.",
+    ("de", "close_denied"): "❌ Nur Verkäufer oder Staff kann schließen.",
+    ("pl", "close_denied"): "❌ Tylko sprzedawca lub staff może zamknąć.",
+    ("de", "close_status"): "🔴 Closed",
+    ("pl", "close_status"): "🔴 Zamknięte",
+    ("de", "close_ok"): "✅ Anzeige geschlossen.",
+    ("pl", "close_ok"): "✅ Ogłoszenie zamknięte.",
+    ("de", "modal_title"): "Direktverkauf ({label})",
+    ("pl", "modal_title"): "Sprzedaż bezpośrednia ({label})",
+    ("de", "modal_labels"): ("Was verkaufst du?", "Preis", "Ort/Info", "Kontakt/Zeiten"),
+    ("pl", "modal_labels"): ("Co sprzedajesz?", "Cena", "Miejsce/Info", "Kontakt/Godziny"),
+    ("de", "sale_no_role"): "❌ Du hast nicht die Rolle für diesen Markt.",
+    ("pl", "sale_no_role"): "❌ Nie masz roli do tego rynku.",
+    ("de", "sale_posted"): "✅ Anzeige gepostet in {channel}.",
+    ("pl", "sale_posted"): "✅ Ogłoszenie dodane w {channel}.",
+}
+
+MARKET_STATUS_IDX = 4  # MarketSaleModal: Item, Preis, Ort/Info, Kontakt, Status
+
+
+def market_meta(seller_id: int, region_key: str, claimed_by: int | None, status_idx: int) -> str:
     cb = claimed_by if claimed_by is not None else 0
-    return f"seller_id={seller_id}|region={region_key}|claimed_by={cb}"
+    return f"seller_id={seller_id}|region={region_key}|claimed_by={cb}|status_idx={status_idx}"
 
 
 def parse_market_meta(emb: discord.Embed) -> dict:
-    out = {"seller_id": 0, "region": None, "claimed_by": 0}
     if not emb.footer or not emb.footer.text:
-        return out
-    txt = emb.footer.text
-    parts = [p.strip() for p in txt.split("|")]
-    for p in parts:
-        if "=" in p:
-            k, v = p.split("=", 1)
-            k = k.strip()
-            v = v.strip()
-            if k == "seller_id":
-                out["seller_id"] = int(v) if v.isdigit() else 0
-            elif k == "region":
-                out["region"] = v
-            elif k == "claimed_by":
-                out["claimed_by"] = int(v) if v.isdigit() else 0
-    return out
+        return {"seller_id": 0, "region": None, "claimed_by": 0, "status_idx": -1}
+    # Footer hat dasselbe "k=v|k=v"-Format wie die Ticket-Topics -> gleicher vorkompilierter Regex
+    data = parse_topic(emb.footer.text)
+    seller = data.get("seller_id", "")
+    claimed = data.get("claimed_by", "")
+    status_idx = data.get("status_idx", "")
+    return {
+        "seller_id": int(seller) if seller.isdigit() else 0,
+        "region": data.get("region"),
+        "claimed_by": int(claimed) if claimed.isdigit() else 0,
+        "status_idx": int(status_idx) if status_idx.isdigit() else -1,  # alte Anzeigen: kein Index im Footer
+    }
+
+
+def set_market_status(fields: list[dict], status_idx: int, text: str) -> int:
+    # arbeitet auf den Feld-Dicts aus Embed.to_dict();
+    # Index aus dem Footer direkt nutzen, nur alte Anzeigen ohne Index werden durchsucht
+    if not (0 <= status_idx < len(fields) and fields[status_idx].get("name") == "Status"):
+        status_idx = next((i for i, f in enumerate(fields) if f.get("name", "").lower() == "status"), -1)
+    field = {"name": "Status", "value": text, "inline": False}
+    if status_idx == -1:
+        fields.append(field)
+        return len(fields) - 1
+    fields[status_idx] = field
+    return status_idx
+
+
+# msg_id -> geparste Footer-Meta; begrenzt (LRU), nach jedem eigenen Edit aktualisiert
+MARKET_META_CACHE_MAX = 1024
+_market_meta_cache: OrderedDict[int, dict] = OrderedDict()
+
+
+def remember_market_meta(msg_id: int, meta: dict):
+    _market_meta_cache[msg_id] = meta
+    _market_meta_cache.move_to_end(msg_id)
+    if len(_market_meta_cache) > MARKET_META_CACHE_MAX:
+        _market_meta_cache.popitem(last=False)
+
+
+def market_meta_for(msg: discord.Message) -> dict:
+    meta = _market_meta_cache.get(msg.id)
+    if meta is None:
+        meta = parse_market_meta(msg.embeds[0])
+    remember_market_meta(msg.id, meta)
+    return meta
+
+
+async def update_market_status(
+    interaction: discord.Interaction,
+    msg: discord.Message,
+    meta: dict,
+    cfg: MarketRegion,
+    *,
+    status_text: str,
+    claimed_by: int,
+    ok_text: str,
+    log_title: str,
+    log_color: discord.Color,
+    log_by: str,
+    view: discord.ui.View | None = None,
+):
+    # gemeinsamer Teil von Claim/Close: Status + Footer setzen, editieren, antworten, loggen
+    actor = interaction.user
+    seller_id = meta["seller_id"]
+    region = meta["region"]
+
+    # Dict des bestehenden Embeds direkt ändern statt Embed.copy() + set_field_at/set_footer
+    data = msg.embeds[0].to_dict()
+    fields = data["fields"] = list(data.get("fields", ()))  # to_dict teilt die Feldliste mit dem gecachten Embed
+    status_idx = set_market_status(fields, meta["status_idx"], status_text)
+    data["footer"] = {"text": market_meta(seller_id=seller_id, region_key=region, claimed_by=claimed_by, status_idx=status_idx)}
+    new_emb = discord.Embed.from_dict(data)
+
+    if view is None:
+        await msg.edit(embed=new_emb)
+    else:
+        await msg.edit(embed=new_emb, view=view)
+    remember_market_meta(msg.id, {"seller_id": seller_id, "region": region, "claimed_by": claimed_by, "status_idx": status_idx})
+
+    await interaction.response.send_message(ok_text, ephemeral=True)
+
+    spawn(send_log(
+        interaction.guild,
+        title=log_title,
+        color=log_color,
+        user=actor,
+        fields=[
+            ("Region", cfg.label, True),
+            ("Seller ID", str(seller_id), True),
+            (log_by, f"{actor.mention} (`{actor.id}`)", False),
+            ("Listing Msg", f"`{msg.id}` in {msg.channel.mention}", False),
+        ],
+    ))
 
 
 class MarketListingView(discord.ui.View):
@@ -717,44 +1312,36 @@ class MarketListingView(discord.ui.View):
         if not msg or not msg.embeds:
             return await interaction.response.send_message("❌ Keine Anzeige gefunden.", ephemeral=True)
 
-        emb = msg.embeds[0]
-        meta = parse_market_meta(emb)
+        meta = market_meta_for(msg)
         region = meta.get("region")
         seller_id = int(meta.get("seller_id") or 0)
 
         if not region or seller_id == 0:
             return await interaction.response.send_message("❌ Anzeige-Metadaten fehlen.", ephemeral=True)
 
+        cfg = MARKET_CFG[region]
+        lang = cfg.lang
         buyer = interaction.user
         if buyer.id == seller_id:
-            lang = MARKET_CFG[region]["lang"]
-            return await interaction.response.send_message("❌ Du bist der Verkäufer." if lang != "pl" else "❌ Jesteś sprzedawcą.", ephemeral=True)
+            return await interaction.response.send_message(MSG[(lang, "seller_self")], ephemeral=True)
 
         seller = interaction.guild.get_member(seller_id)
         seller_mention = seller.mention if seller else f"<@{seller_id}>"
 
-        lang = MARKET_CFG[region]["lang"]
-        if lang == "pl":
-            text = f"📩 {buyer.mention} chce skontaktować się ze sprzedawcą {seller_mention}. Napiszcie do siebie na DM i dogadajcie się."
-            ok = "✅ Wysłano ping kontaktowy."
-        else:
-            text = f"📩 {buyer.mention} möchte den Verkäufer {seller_mention} kontaktieren. Bitte per DM klären."
-            ok = "✅ Kontakt gepingt."
-
-        await interaction.response.send_message(ok, ephemeral=True)
-        await msg.channel.send(text)
+        await interaction.response.send_message(MSG[(lang, "contact_ok")], ephemeral=True)
+        await msg.channel.send(MSG[(lang, "contact_text")].format(buyer=buyer.mention, seller=seller_mention))
 
-        await send_log(
+        spawn(send_log(
             interaction.guild,
             title="📩 Market Kontakt",
-            color=discord.Color.blurple(),
+            color=COLOR_BLURPLE,
             user=buyer,
             fields=[
-                ("Region", MARKET_CFG[region]["label"], True),
+                ("Region", cfg.label, True),
                 ("Seller", f"{seller_mention} (`{seller_id}`)", False),
                 ("Listing Msg", f"`{msg.id}` in {msg.channel.mention}", False),
             ],
-        )
+        ))
 
     @discord.ui.button(label="Claim", style=discord.ButtonStyle.success, emoji="🧾", custom_id="market:claim")
     async def claim(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -765,8 +1352,7 @@ class MarketListingView(discord.ui.View):
         if not msg or not msg.embeds:
             return await interaction.response.send_message("❌ Keine Anzeige gefunden.", ephemeral=True)
 
-        emb = msg.embeds[0]
-        meta = parse_market_meta(emb)
+        meta = market_meta_for(msg)
         region = meta.get("region")
         seller_id = int(meta.get("seller_id") or 0)
         claimed_by = int(meta.get("claimed_by") or 0)
@@ -774,50 +1360,28 @@ class MarketListingView(discord.ui.View):
         if not region or seller_id == 0:
             return await interaction.response.send_message("❌ Anzeige-Metadaten fehlen.", ephemeral=True)
 
+        cfg = MARKET_CFG[region]
         buyer = interaction.user
-        lang = MARKET_CFG[region]["lang"]
+        lang = cfg.lang
 
         if buyer.id == seller_id:
-            return await interaction.response.send_message("❌ Verkäufer kann nicht claimen." if lang != "pl" else "❌ Sprzedawca nie może zająć.", ephemeral=True)
+            return await interaction.response.send_message(MSG[(lang, "claim_seller")], ephemeral=True)
 
-        required_role = MARKET_CFG[region]["allowed_role_id"]
+        required_role = cfg.allowed_role_id
         if required_role and not has_role(buyer, required_role):
-            return await interaction.response.send_message(
-                "❌ Du hast nicht die passende Rolle für diesen Markt." if lang != "pl" else "❌ Nie masz odpowiedniej roli do tego rynku.",
-                ephemeral=True
-            )
+            return await interaction.response.send_message(MSG[(lang, "claim_role")], ephemeral=True)
 
         if claimed_by != 0:
-            return await interaction.response.send_message("✅ Bereits geclaimt." if lang != "pl" else "✅ Ogłoszenie jest już zajęte.", ephemeral=True)
-
-        new_emb = emb.copy()
-        status_text = f"🟢 Geclaimt von {buyer.mention}" if lang != "pl" else f"🟢 Zajęte przez {buyer.mention}"
-
-        found = False
-        for i, f in enumerate(new_emb.fields):
-            if f.name.lower() == "status":
-                new_emb.set_field_at(i, name="Status", value=status_text, inline=False)
-                found = True
-                break
-        if not found:
-            new_emb.add_field(name="Status", value=status_text, inline=False)
-
-        new_emb.set_footer(text=market_meta(seller_id=seller_id, region_key=region, claimed_by=buyer.id))
-        await msg.edit(embed=new_emb)
-
-        await interaction.response.send_message("✅ Geclaimt." if lang != "pl" else "✅ Zajęte.", ephemeral=True)
-
-        await send_log(
-            interaction.guild,
-            title="🧾 Market Claim",
-            color=discord.Color.gold(),
-            user=buyer,
-            fields=[
-                ("Region", MARKET_CFG[region]["label"], True),
-                ("Seller ID", str(seller_id), True),
-                ("Claimed by", f"{buyer.mention} (`{buyer.id}`)", False),
-                ("Listing Msg", f"`{msg.id}` in {msg.channel.mention}", False),
-            ],
+            return await interaction.response.send_message(MSG[(lang, "claim_taken")], ephemeral=True)
+
+        await update_market_status(
+            interaction, msg, meta, cfg,
+            status_text=MSG[(lang, "claim_status")].format(buyer=buyer.mention),
+            claimed_by=buyer.id,
+            ok_text=MSG[(lang, "claim_ok")],
+            log_title="🧾 Market Claim",
+            log_color=COLOR_GOLD,
+            log_by="Claimed by",
         )
 
     @discord.ui.button(label="Close", style=discord.ButtonStyle.danger, emoji="🔒", custom_id="market:close")
@@ -829,8 +1393,7 @@ class MarketListingView(discord.ui.View):
         if not msg or not msg.embeds:
             return await interaction.response.send_message("❌ Keine Anzeige gefunden.", ephemeral=True)
 
-        emb = msg.embeds[0]
-        meta = parse_market_meta(emb)
+        meta = market_meta_for(msg)
         region = meta.get("region")
         seller_id = int(meta.get("seller_id") or 0)
         claimed_by = int(meta.get("claimed_by") or 0)
@@ -839,67 +1402,56 @@ class MarketListingView(discord.ui.View):
             return await interaction.response.send_message("❌ Anzeige-Metadaten fehlen.", ephemeral=True)
 
         actor = interaction.user
-        staff_ids = MARKET_CFG[region]["staff_role_ids"]
-        lang = MARKET_CFG[region]["lang"]
+        cfg = MARKET_CFG[region]
+        staff_ids = cfg.staff_role_ids
+        lang = cfg.lang
 
         is_owner = actor.id == seller_id
         if not (is_owner or is_market_staff(actor, staff_ids)):
-            return await interaction.response.send_message(
-                "❌ Nur Verkäufer oder Staff kann schließen." if lang != "pl" else "❌ Tylko sprzedawca lub staff może zamknąć.",
-                ephemeral=True
-            )
-
-        new_emb = emb.copy()
-        closed_text = "🔴 Closed" if lang != "pl" else "🔴 Zamknięte"
-
-        found = False
-        for i, f in enumerate(new_emb.fields):
-            if f.name.lower() == "status":
-                new_emb.set_field_at(i, name="Status", value=closed_text, inline=False)
-                found = True
-                break
-        if not found:
-            new_emb.add_field(name="Status", value=closed_text, inline=False)
-
-        new_emb.set_footer(text=market_meta(seller_id=seller_id, region_key=region, claimed_by=claimed_by))
-
-        await msg.edit(embed=new_emb, view=MarketListingView(disabled=True))
+            return await interaction.response.send_message(MSG[(lang, "close_denied")], ephemeral=True)
+
+        await update_market_status(
+            interaction, msg, meta, cfg,
+            status_text=MSG[(lang, "close_status")],
+            claimed_by=claimed_by,
+            ok_text=MSG[(lang, "close_ok")],
+            log_title="🔒 Market Close",
+            log_color=COLOR_RED,
+            log_by="Closed by",
+            view=panel_view(MarketListingView, True),
+        )
 
-        await interaction.response.send_message("✅ Anzeige geschlossen." if lang != "pl" else "✅ Ogłoszenie zamknięte.", ephemeral=True)
 
-        await send_log(
-            interaction.guild,
-            title="🔒 Market Close",
-            color=discord.Color.red(),
-            user=actor,
-            fields=[
-                ("Region", MARKET_CFG[region]["label"], True),
-                ("Seller ID", str(seller_id), True),
-                ("Closed by", f"{actor.mention} (`{actor.id}`)", False),
-                ("Listing Msg", f"`{msg.id}` in {msg.channel.mention}", False),
-            ],
-        )
+# Anzeigen-Gerüst je Region einmal vorbauen; pro Submit nur noch die Werte einsetzen
+_LISTING_TEXT = {
+    "de": ("🛒 Direktverkauf", "Seller", ("Item", "Preis", "Ort/Info", "Kontakt/Zeiten"), "🟡 Open"),
+    "pl": ("🛒 Sprzedaż bezpośrednia", "Sprzedawca", ("Przedmiot", "Cena", "Miejsce/Info", "Kontakt/Godziny"), "🟡 Otwarte"),
+}
+_LISTING_TEMPLATES = {}
+for _region, _cfg in MARKET_CFG.items():
+    _title, _seller, _names, _status = _LISTING_TEXT[_cfg.lang]
+    _LISTING_TEMPLATES[_region] = {
+        "base": {"type": "rich", "title": f"{_title} ({_cfg.label})", "color": COLOR_GREEN.value},
+        "seller": _seller,
+        "names": _names,
+        "status": {"name": "Status", "value": _status, "inline": False},
+    }
 
 
 class MarketSaleModal(discord.ui.Modal):
     def __init__(self, opener: discord.Member, region_key: str):
         self.opener = opener
         self.region_key = region_key
-        lang = MARKET_CFG[region_key]["lang"]
+        cfg = MARKET_CFG[region_key]
+        lang = cfg.lang
 
-        title = "Sprzedaż bezpośrednia" if lang == "pl" else "Direktverkauf"
-        super().__init__(title=f"{title} ({MARKET_CFG[region_key]['label']})")
+        super().__init__(title=MSG[(lang, "modal_title")].format(label=cfg.label))
 
-        if lang == "pl":
-            self.item = discord.ui.TextInput(label="Co sprzedajesz?", max_length=200)
-            self.price = discord.ui.TextInput(label="Cena", max_length=80)
-            self.location = discord.ui.TextInput(label="Miejsce/Info", required=False, max_length=120)
-            self.contact = discord.ui.TextInput(label="Kontakt/Godziny", required=False, max_length=150)
-        else:
-            self.item = discord.ui.TextInput(label="Was verkaufst du?", max_length=200)
-            self.price = discord.ui.TextInput(label="Preis", max_length=80)
-            self.location = discord.ui.TextInput(label="Ort/Info", required=False, max_length=120)
-            self.contact = discord.ui.TextInput(label="Kontakt/Zeiten", required=False, max_length=150)
+        l_item, l_price, l_location, l_contact = MSG[(lang, "modal_labels")]
+        self.item = discord.ui.TextInput(label=l_item, max_length=200)
+        self.price = discord.ui.TextInput(label=l_price, max_length=80)
+        self.location = discord.ui.TextInput(label=l_location, required=False, max_length=120)
+        self.contact = discord.ui.TextInput(label=l_contact, required=False, max_length=150)
 
         self.add_item(self.item)
         self.add_item(self.price)
@@ -913,58 +1465,45 @@ class MarketSaleModal(discord.ui.Modal):
         guild = interaction.guild
         member = self.opener
         cfg = MARKET_CFG[self.region_key]
-        lang = cfg["lang"]
+        lang = cfg.lang
 
-        if not has_role(member, cfg["allowed_role_id"]):
-            return await interaction.response.send_message(
-                "❌ Du hast nicht die Rolle für diesen Markt." if lang != "pl" else "❌ Nie masz roli do tego rynku.",
-                ephemeral=True
-            )
+        if not has_role(member, cfg.allowed_role_id):
+            return await interaction.response.send_message(MSG[(lang, "sale_no_role")], ephemeral=True)
 
-        listings_ch = await get_text_channel(guild, cfg["listings_channel_id"])
+        listings_ch = get_text_channel(guild, cfg.listings_channel_id)
         if not isinstance(listings_ch, discord.TextChannel):
             return await interaction.response.send_message("❌ Listings-Channel nicht gefunden (ID prüfen).", ephemeral=True)
 
-        if lang == "pl":
-            emb = discord.Embed(
-                title=f"🛒 Sprzedaż bezpośrednia ({cfg['label']})",
-                description=f"Sprzedawca: {member.mention}",
-                color=discord.Color.green()
-            )
-            emb.add_field(name="Przedmiot", value=str(self.item), inline=False)
-            emb.add_field(name="Cena", value=str(self.price), inline=True)
-            emb.add_field(name="Miejsce/Info", value=(str(self.location).strip() or "—"), inline=True)
-            emb.add_field(name="Kontakt/Godziny", value=(str(self.contact).strip() or "—"), inline=False)
-            emb.add_field(name="Status", value="🟡 Otwarte", inline=False)
-        else:
-            emb = discord.Embed(
-                title=f"🛒 Direktverkauf ({cfg['label']})",
-                description=f"Seller: {member.mention}",
-                color=discord.Color.green()
-            )
-            emb.add_field(name="Item", value=str(self.item), inline=False)
-            emb.add_field(name="Preis", value=str(self.price), inline=True)
-            emb.add_field(name="Ort/Info", value=(str(self.location).strip() or "—"), inline=True)
-            emb.add_field(name="Kontakt/Zeiten", value=(str(self.contact).strip() or "—"), inline=False)
-            emb.add_field(name="Status", value="🟡 Open", inline=False)
-
-        emb.set_thumbnail(url=member.display_avatar.url)
-        emb.set_footer(text=market_meta(seller_id=member.id, region_key=self.region_key, claimed_by=None))
+        tpl = _LISTING_TEMPLATES[self.region_key]
+        n_item, n_price, n_location, n_contact = tpl["names"]
+        emb = discord.Embed.from_dict({
+            **tpl["base"],
+            "description": f"{tpl['seller']}: {member.mention}",
+            "thumbnail": {"url": member.display_avatar.url},
+            "footer": {"text": market_meta(seller_id=member.id, region_key=self.region_key, claimed_by=None, status_idx=MARKET_STATUS_IDX)},
+            "fields": [
+                {"name": n_item, "value": str(self.item), "inline": False},
+                {"name": n_price, "value": str(self.price), "inline": True},
+                {"name": n_location, "value": str(self.location).strip() or "—", "inline": True},
+                {"name": n_contact, "value": str(self.contact).strip() or "—", "inline": False},
+                {**tpl["status"]},  # from_dict übernimmt die Dicts ohne Kopie
+            ],
+        })
 
-        await listings_ch.send(embed=emb, view=MarketListingView(disabled=False))
+        await listings_ch.send(embed=emb, view=panel_view(MarketListingView, False))
 
         await interaction.response.send_message(
-            f"✅ Anzeige gepostet in {listings_ch.mention}." if lang != "pl" else f"✅ Ogłoszenie dodane w {listings_ch.mention}.",
+            MSG[(lang, "sale_posted")].format(channel=listings_ch.mention),
             ephemeral=True
         )
 
-        await send_log(
+        spawn(send_log(
             guild,
             title="💸 Market Listing erstellt",
-            color=discord.Color.green(),
+            color=COLOR_GREEN,
             user=member,
-            fields=[("Region", cfg["label"], True), ("Channel", listings_ch.mention, True)],
-        )
+            fields=[("Region", cfg.label, True), ("Channel", listings_ch.mention, True)],
+        ))
 
 
 class MarketOpenViewBerlin(discord.ui.View):
@@ -975,7 +1514,7 @@ class MarketOpenViewBerlin(discord.ui.View):
     async def start(self, interaction: discord.Interaction, button: discord.ui.Button):
         if not interaction.guild or not isinstance(interaction.user, discord.Member):
             return await interaction.response.send_message("Nur im Server nutzbar.", ephemeral=True)
-        if not has_role(interaction.user, MARKET_CFG["berlin"]["allowed_role_id"]):
+        if not has_role(interaction.user, MARKET_CFG["berlin"].allowed_role_id):
             return await interaction.response.send_message("❌ Du brauchst die Berlin/Germany Rolle.", ephemeral=True)
         await interaction.response.send_modal(MarketSaleModal(opener=interaction.user, region_key="berlin"))
 
@@ -988,58 +1527,91 @@ class MarketOpenViewPoland(discord.ui.View):
     async def start(self, interaction: discord.Interaction, button: discord.ui.Button):
         if not interaction.guild or not isinstance(interaction.user, discord.Member):
             return await interaction.response.send_message("Tylko na serwerze.", ephemeral=True)
-        if not has_role(interaction.user, MARKET_CFG["poland"]["allowed_role_id"]):
+        if not has_role(interaction.user, MARKET_CFG["poland"].allowed_role_id):
             return await interaction.response.send_message("❌ Potrzebujesz roli Polska.", ephemeral=True)
         await interaction.response.send_modal(MarketSaleModal(opener=interaction.user, region_key="poland"))
 
 
 # ==================== Economy Helpers ====================
-def econ_get(guild_id: int, user_id: int) -> tuple[int, str | None]:
-    conn = db()
-    try:
-        row = conn.execute(
-            "SELECT balance, last_daily FROM economy WHERE guild_id=? AND user_id=?",
-            (guild_id, user_id)
-        ).fetchone()
-        if not row:
-            conn.execute(
-                "INSERT OR IGNORE INTO economy(guild_id, user_id, balance, last_daily) VALUES (?, ?, 0, NULL)",
-                (guild_id, user_id)
-            )
-            conn.commit()
-            return 0, None
-        return int(row[0]), row[1]
-    finally:
-        conn.close()
+def econ_get(guild_id: int, user_id: int) -> tuple[int, int | None]:
+    # kein Insert beim Lesen: fehlende Row == Kontostand 0, die Setter legen sie per UPSERT an
+    with _db_read() as conn:
+        row = conn.execute(SQL_ECON_GET, (guild_id, user_id)).fetchone()
+    if not row:
+        return 0, None
+    return int(row[0]), row[1]
 
 
-def econ_set_balance(guild_id: int, user_id: int, new_balance: int):
-    conn = db()
-    try:
-        conn.execute(
-            "INSERT INTO economy(guild_id, user_id, balance, last_daily) VALUES (?, ?, ?, NULL) "
-            "ON CONFLICT(guild_id, user_id) DO UPDATE SET balance=excluded.balance",
-            (guild_id, user_id, int(new_balance))
-        )
-        conn.commit()
-    finally:
-        conn.close()
+def econ_transfer(guild_id: int, sender_id: int, recv_id: int, amount: int) -> bool:
+    # Abbuchen nur bei genug Guthaben (im UPDATE geprüft) -> kein Double-Spend bei parallelem /pay
+    with _db_tx() as conn:
+        cur = conn.execute(SQL_ECON_DEBIT, (amount, guild_id, sender_id, amount))
+        if cur.rowcount != 1:
+            return False
+        conn.execute(SQL_ECON_CREDIT, (guild_id, recv_id, amount))
+    return True
 
 
-def econ_set_daily(guild_id: int, user_id: int, last_daily_iso: str):
-    conn = db()
-    try:
-        conn.execute(
-            "INSERT INTO economy(guild_id, user_id, balance, last_daily) VALUES (?, ?, 0, ?) "
-            "ON CONFLICT(guild_id, user_id) DO UPDATE SET last_daily=excluded.last_daily",
-            (guild_id, user_id, last_daily_iso)
-        )
-        conn.commit()
-    finally:
-        conn.close()
+def econ_claim_daily(guild_id: int, user_id: int, reward: int, last_daily_ts: int) -> int:
+    # Reward + Zeitstempel in einem Statement, gibt neuen Kontostand zurück
+    with _DB_LOCK:
+        # fetchall: Statement sofort zu Ende laufen lassen, damit der Write committed ist
+        rows = _CONN.execute(SQL_ECON_CLAIM_DAILY, (guild_id, user_id, reward, last_daily_ts)).fetchall()
+    return int(rows[0][0])
+
+
+# Async-Varianten: SQLite-I/O im Thread-Pool, damit der Event-Loop (Heartbeat) nie auf fsync wartet
+async def econ_get_async(guild_id: int, user_id: int) -> tuple[int, int | None]:
+    return await asyncio.to_thread(econ_get, guild_id, user_id)
+
+
+async def econ_transfer_async(guild_id: int, sender_id: int, recv_id: int, amount: int) -> bool:
+    return await asyncio.to_thread(econ_transfer, guild_id, sender_id, recv_id, amount)
+
+
+async def econ_claim_daily_async(guild_id: int, user_id: int, reward: int, last_daily_ts: int) -> int:
+    return await asyncio.to_thread(econ_claim_daily, guild_id, user_id, reward, last_daily_ts)
 
 
 # ==================== Commands: Setup Panels ====================
+# Panel-Embeds sind statisch -> einmal bauen. Views brauchen einen laufenden Loop,
+# daher erst beim ersten Zugriff (on_ready) instanziieren und danach wiederverwenden.
+TICKET_PANEL_EMBED = discord.Embed(title="Tickets", description="Click below to create a new ticket", color=COLOR_DARK_GREY)
+ROLE_PANEL_EMBED = discord.Embed(
+    title="Server Role",
+    description=(
+        "__________________________\n\n"
+        "**Polski**\n"
+        "Naciśnij przycisk. Wtedy dostaniesz swoją rolę.\n\n"
+        "**Deutsch**\n"
+        "Drück auf den Button. Dann bekommst du deine Rolle.\n\n"
+        "__________________________"
+    ),
+    color=COLOR_GREEN
+)
+MARKET_PANEL_EMBED_BERLIN = discord.Embed(
+    title="💸 Direktverkauf (Berlin)",
+    description="Klicke unten, fülle das Formular aus und dein Verkauf wird als Anzeige im Markt gepostet.",
+    color=COLOR_GREEN
+)
+MARKET_PANEL_EMBED_POLAND = discord.Embed(
+    title="💸 Sprzedaż bezpośrednia (Polska)",
+    description="Kliknij poniżej, wypełnij formularz, a ogłoszenie pojawi się na rynku.",
+    color=COLOR_GREEN
+)
+
+_panel_views: dict[tuple, discord.ui.View] = {}
+
+
+def panel_view(cls: type, *args) -> discord.ui.View:
+    # zustandslose Views nur einmal bauen; args unterscheiden Varianten, z.B. MarketListingView(disabled=True)
+    key = (cls, args)
+    view = _panel_views.get(key)
+    if view is None:
+        view = _panel_views[key] = cls(*args)
+    return view
+
+
 @bot.tree.command(name="ticket_setup", description="Postet das Ticket Panel (Staff/Admin)")
 @staff_check()
 async def ticket_setup(interaction: discord.Interaction):
@@ -1052,8 +1624,7 @@ async def ticket_setup(interaction: discord.Interaction):
     if not isinstance(panel_ch, discord.TextChannel):
         return await interaction.response.send_message("❌ Panel-Channel nicht gefunden.", ephemeral=True)
 
-    embed = discord.Embed(title="Tickets", description="Click below to create a new ticket", color=discord.Color.dark_grey())
-    await panel_ch.send(embed=embed, view=TicketOpenView())
+    await panel_ch.send(embed=TICKET_PANEL_EMBED, view=panel_view(TicketOpenView))
     await interaction.response.send_message(f"✅ Ticket-Panel gepostet in {panel_ch.mention}", ephemeral=True)
 
 
@@ -1069,19 +1640,7 @@ async def role_setup(interaction: discord.Interaction):
     if not isinstance(ch, discord.TextChannel):
         return await interaction.response.send_message("❌ Role-Panel Channel nicht gefunden.", ephemeral=True)
 
-    embed = discord.Embed(
-        title="Server Role",
-        description=(
-            "__________________________\n\n"
-            "**Polski**\n"
-            "Naciśnij przycisk. Wtedy dostaniesz swoją rolę.\n\n"
-            "**Deutsch**\n"
-            "Drück auf den Button. Dann bekommst du deine Rolle.\n\n"
-            "__________________________"
-        ),
-        color=discord.Color.green()
-    )
-    await ch.send(embed=embed, view=RolePanelView())
+    await ch.send(embed=ROLE_PANEL_EMBED, view=panel_view(RolePanelView))
     await interaction.response.send_message(f"✅ Rollen-Panel gepostet in {ch.mention}", ephemeral=True)
 
 
@@ -1091,19 +1650,14 @@ async def market_setup_berlin(interaction: discord.Interaction):
     if not interaction.guild:
         return await interaction.response.send_message("Nur im Server nutzbar.", ephemeral=True)
     cfg = MARKET_CFG["berlin"]
-    if not cfg["panel_channel_id"]:
+    if not cfg.panel_channel_id:
         return await interaction.response.send_message("❌ MARKET_BERLIN_PANEL_CHANNEL_ID fehlt.", ephemeral=True)
 
-    panel_ch = interaction.guild.get_channel(cfg["panel_channel_id"])
+    panel_ch = interaction.guild.get_channel(cfg.panel_channel_id)
     if not isinstance(panel_ch, discord.TextChannel):
         return await interaction.response.send_message("❌ Berlin Panel-Channel nicht gefunden.", ephemeral=True)
 
-    embed = discord.Embed(
-        title="💸 Direktverkauf (Berlin)",
-        description="Klicke unten, fülle das Formular aus und dein Verkauf wird als Anzeige im Markt gepostet.",
-        color=discord.Color.green()
-    )
-    await panel_ch.send(embed=embed, view=MarketOpenViewBerlin())
+    await panel_ch.send(embed=MARKET_PANEL_EMBED_BERLIN, view=panel_view(MarketOpenViewBerlin))
     await interaction.response.send_message(f"✅ Berlin Direktverkauf-Panel gepostet in {panel_ch.mention}", ephemeral=True)
 
 
@@ -1113,39 +1667,28 @@ async def market_setup_poland(interaction: discord.Interaction):
     if not interaction.guild:
         return await interaction.response.send_message("Tylko na serwerze.", ephemeral=True)
     cfg = MARKET_CFG["poland"]
-    if not cfg["panel_channel_id"]:
+    if not cfg.panel_channel_id:
         return await interaction.response.send_message("❌ Brak MARKET_POLAND_PANEL_CHANNEL_ID.", ephemeral=True)
 
-    panel_ch = interaction.guild.get_channel(cfg["panel_channel_id"])
+    panel_ch = interaction.guild.get_channel(cfg.panel_channel_id)
     if not isinstance(panel_ch, discord.TextChannel):
         return await interaction.response.send_message("❌ Nie znaleziono kanału panelu (Polska).", ephemeral=True)
 
-    embed = discord.Embed(
-        title="💸 Sprzedaż bezpośrednia (Polska)",
-        description="Kliknij poniżej, wypełnij formularz, a ogłoszenie pojawi się na rynku.",
-        color=discord.Color.green()
-    )
-    await panel_ch.send(embed=embed, view=MarketOpenViewPoland())
+    await panel_ch.send(embed=MARKET_PANEL_EMBED_POLAND, view=panel_view(MarketOpenViewPoland))
     await interaction.response.send_message(f"✅ Panel Polska wysłany w {panel_ch.mention}", ephemeral=True)
 
 
 # ==================== Commands: Ticket direct ====================
 ticket_group = app_commands.Group(name="ticket", description="Ticket Commands")
 
+# Ticket-Typ -> Emoji (Auswahl kommt als Choice vom Discord-Client, keine freie Eingabe mehr)
+_TICKET_TYPES = {"Question": "❓", "Recruitment": "📌", "Partnership": "🤝"}
+
 
 @ticket_group.command(name="create", description="Erstellt ein Support-Ticket")
 @app_commands.describe(typ="Typ: Question / Recruitment / Partnership")
-async def ticket_create(interaction: discord.Interaction, typ: str):
-    view = TicketOpenView()
-    typ_l = typ.lower().strip()
-    if typ_l in ("question", "frage"):
-        await view._create_ticket(interaction, "Question", "❓")
-    elif typ_l in ("recruitment", "bewerbung"):
-        await view._create_ticket(interaction, "Recruitment", "📌")
-    elif typ_l in ("partnership", "partner", "partnerschaft"):
-        await view._create_ticket(interaction, "Partnership", "🤝")
-    else:
-        await interaction.response.send_message("❌ Ungültiger Typ. Nutze: Question / Recruitment / Partnership", ephemeral=True)
+async def ticket_create(interaction: discord.Interaction, typ: Literal["Question", "Recruitment", "Partnership"]):
+    await panel_view(TicketOpenView)._create_ticket(interaction, typ, _TICKET_TYPES[typ])
 
 
 @ticket_group.command(name="close", description="Schließt dieses Ticket (löscht Channel)")
@@ -1156,32 +1699,12 @@ async def ticket_close(interaction: discord.Interaction):
     if not isinstance(ch, discord.TextChannel):
         return await interaction.response.send_message("Nur im Ticket-Channel nutzbar.", ephemeral=True)
 
-    topic_data = parse_topic(ch.topic)
-    owner_id = int(topic_data.get("user_id", "0") or 0)
-    is_owner = owner_id == interaction.user.id
+    is_owner = topic_owner_id(ch.topic) == interaction.user.id
     if not (is_owner or is_staff(interaction.user)):
         return await interaction.response.send_message("❌ Du darfst dieses Ticket nicht schließen.", ephemeral=True)
 
     await interaction.response.send_message("🔒 Ticket wird in **5 Sekunden** geschlossen…", ephemeral=True)
-
-    transcript = await build_text_channel_transcript(ch, limit=TRANSCRIPT_LIMIT)
-    f = discord.File(fp=io.BytesIO(transcript.encode("utf-8")), filename=f"{ch.name}-transcript.txt")
-
-    await send_log(
-        interaction.guild,
-        title="🔒 Ticket geschlossen",
-        color=discord.Color.red(),
-        user=interaction.user,
-        fields=[("Channel", f"#{ch.name} (`{ch.id}`)", False),
-                ("Closed by", f"{interaction.user.mention} (`{interaction.user.id}`)", False)],
-        file=f,
-    )
-
-    await asyncio.sleep(5)
-    try:
-        await ch.delete(reason=f"Ticket geschlossen von {interaction.user}")
-    except discord.Forbidden:
-        pass
+    spawn(finish_ticket_close(ch, interaction.user))
 
 
 bot.tree.add_command(ticket_group)
@@ -1202,13 +1725,13 @@ async def clear(interaction: discord.Interaction, anzahl: int):
     deleted = await interaction.channel.purge(limit=anzahl)
     await interaction.followup.send(f"✅ Gelöscht: {len(deleted)} Nachricht(en).", ephemeral=True)
 
-    await send_log(
+    spawn(send_log(
         interaction.guild,
         title="🧹 Messages gelöscht",
-        color=discord.Color.blurple(),
+        color=COLOR_BLURPLE,
         user=interaction.user,
         fields=[("Channel", interaction.channel.mention, True), ("Anzahl", str(len(deleted)), True)],
-    )
+    ))
 
 
 @bot.tree.command(name="kick", description="Kickt einen User")
@@ -1224,15 +1747,15 @@ async def kick(interaction: discord.Interaction, user: discord.Member, grund: st
         await user.kick(reason=f"{grund} | by {interaction.user}")
         await interaction.response.send_message(f"✅ {user} wurde gekickt. Grund: {grund}", ephemeral=True)
 
-        await send_log(
+        spawn(send_log(
             interaction.guild,
             title="👢 Kick",
-            color=discord.Color.orange(),
+            color=COLOR_ORANGE,
             user=user,
             fields=[("User", f"{user.mention} (`{user.id}`)", False),
                     ("Moderator", f"{interaction.user.mention} (`{interaction.user.id}`)", False),
                     ("Grund", grund, False)],
-        )
+        ))
     except discord.Forbidden:
         await interaction.response.send_message("❌ Bot hat keine Rechte zum Kicken.", ephemeral=True)
 
@@ -1250,15 +1773,15 @@ async def ban(interaction: discord.Interaction, user: discord.Member, grund: str
         await user.ban(reason=f"{grund} | by {interaction.user}")
         await interaction.response.send_message(f"✅ {user} wurde gebannt. Grund: {grund}", ephemeral=True)
 
-        await send_log(
+        spawn(send_log(
             interaction.guild,
             title="⛔ Ban",
-            color=discord.Color.red(),
+            color=COLOR_RED,
             user=user,
             fields=[("User", f"{user.mention} (`{user.id}`)", False),
                     ("Moderator", f"{interaction.user.mention} (`{interaction.user.id}`)", False),
                     ("Grund", grund, False)],
-        )
+        ))
     except discord.Forbidden:
         await interaction.response.send_message("❌ Bot hat keine Rechte zum Bannen.", ephemeral=True)
 
@@ -1279,17 +1802,17 @@ async def timeout(interaction: discord.Interaction, user: discord.Member, minute
         await user.timeout(until, reason=f"{grund} | by {interaction.user}")
         await interaction.response.send_message(f"✅ Timeout gesetzt für {user.mention}: {minuten} Minuten.", ephemeral=True)
 
-        await send_log(
+        spawn(send_log(
             interaction.guild,
             title="⏳ Timeout",
-            color=discord.Color.orange(),
+            color=COLOR_ORANGE,
             user=user,
             fields=[("User", f"{user.mention} (`{user.id}`)", False),
                     ("Moderator", f"{interaction.user.mention} (`{interaction.user.id}`)", False),
                     ("Dauer", f"{minuten} Minuten", True),
                     ("Bis", until.strftime("%d.%m.%Y %H:%M UTC"), True),
                     ("Grund", grund, False)],
-        )
+        ))
     except discord.Forbidden:
         await interaction.response.send_message("❌ Bot hat keine Rechte für Timeout.", ephemeral=True)
 
@@ -1305,7 +1828,7 @@ async def mute_setup(interaction: discord.Interaction):
     muted_role = await get_or_create_muted_role(interaction.guild)
     try:
         await apply_mute_overwrites(interaction.guild, muted_role)
-    except Exception as e:
+    except (RuntimeError, discord.HTTPException) as e:
         return await interaction.followup.send(f"❌ Fehler: {e}", ephemeral=True)
 
     await interaction.followup.send("✅ Mute-Setup abgeschlossen (Muted-Rolle & Overwrites).", ephemeral=True)
@@ -1330,8 +1853,8 @@ async def mute(interaction: discord.Interaction, user: discord.Member, minuten:
 
     muted_role = await get_or_create_muted_role(interaction.guild)
     try:
-        await apply_mute_overwrites(interaction.guild, muted_role)
-    except Exception as e:
+        await ensure_mute_overwrites(interaction.guild, muted_role)
+    except (RuntimeError, discord.HTTPException) as e:
         return await interaction.followup.send(f"❌ Mute-Setup Fehler: {e}", ephemeral=True)
 
     if muted_role in user.roles:
@@ -1342,6 +1865,7 @@ async def mute(interaction: discord.Interaction, user: discord.Member, minuten:
     roles_to_remove: list[discord.Role] = []
     cannot_remove: list[discord.Role] = []
 
+    bot_top = bot_top_role(interaction.guild)
     for r in user.roles:
         if r.is_default():
             continue
@@ -1350,20 +1874,25 @@ async def mute(interaction: discord.Interaction, user: discord.Member, minuten:
 
         backup_role_ids.append(r.id)
 
-        if can_bot_manage_role(interaction.guild, r):
+        if can_bot_manage_role(r, bot_top):
             roles_to_remove.append(r)
         else:
             cannot_remove.append(r)
 
-    save_mute_roles_backup(interaction.guild.id, user.id, backup_role_ids)
-
-    removed_count = 0
-    try:
-        if roles_to_remove:
+    async def _remove_roles() -> int:
+        if not roles_to_remove:
+            return 0
+        try:
             await user.remove_roles(*roles_to_remove, reason=f"Mute: Rollen entfernt | by {interaction.user} | {grund}")
-            removed_count = len(roles_to_remove)
-    except discord.Forbidden:
-        pass
+        except discord.Forbidden:
+            return 0
+        return len(roles_to_remove)
+
+    # Backup-Write (Thread) und REST-Call laufen überlappend statt nacheinander
+    _, removed_count = await asyncio.gather(
+        asyncio.to_thread(save_mute_roles_backup, interaction.guild.id, user.id, backup_role_ids),
+        _remove_roles(),
+    )
 
     # 2) Muted geben
     try:
@@ -1374,32 +1903,23 @@ async def mute(interaction: discord.Interaction, user: discord.Member, minuten:
     unmute_at = None
     if minuten is not None and minuten > 0:
         unmute_at_dt = now_utc() + datetime.timedelta(minutes=minuten)
-        unmute_at = unmute_at_dt.isoformat()
+        unmute_at = int(unmute_at_dt.timestamp())
 
-    conn = db()
-    try:
-        conn.execute(
-            "INSERT OR REPLACE INTO mutes(guild_id, user_id, unmute_at) VALUES (?, ?, ?)",
-            (interaction.guild.id, user.id, unmute_at)
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    await asyncio.to_thread(mute_db_set, interaction.guild.id, user.id, unmute_at)
+    track_mute(interaction.guild.id, user.id, unmute_at)
+    _muted_users.add((interaction.guild.id, user.id))
 
-    unmute_ch = interaction.guild.get_channel(UNMUTE_CHANNEL_ID)
-    unmute_hint = f"#{unmute_ch.name}" if isinstance(unmute_ch, discord.TextChannel) else "den Unmute-Channel"
     dauer_txt = f"{minuten} Minuten" if (minuten and minuten > 0) else "unbestimmt"
 
     try:
-        await user.send(
-            f"🔇 Du wurdest auf **{interaction.guild.name}** gemutet.\n"
-            f"👮 Von: {interaction.user}\n"
-            f"📝 Grund: {grund}\n"
-            f"⏳ Dauer: {dauer_txt}\n\n"
-            f"✅ Du kannst **nur** im **{unmute_hint}** schreiben (für Unmute) "
-            f"und **in deinen eigenen Ticket-Channels**."
-        )
-    except Exception:
+        await user.send(_MUTE_DM_TEMPLATE.format(
+            guild=interaction.guild.name,
+            mod=interaction.user,
+            grund=grund,
+            dauer=dauer_txt,
+            hint=unmute_hint(interaction.guild),
+        ))
+    except discord.HTTPException:
         pass
 
     await interaction.followup.send(f"🔇 {user.mention} wurde gemutet. Dauer: {dauer_txt}", ephemeral=True)
@@ -1411,10 +1931,10 @@ async def mute(interaction: discord.Interaction, user: discord.Member, minuten:
         if len(cannot_remove) > 20:
             cannot_txt += f" …(+{len(cannot_remove)-20})"
 
-    await send_log(
+    spawn(send_log(
         interaction.guild,
         title="🔇 User gemutet",
-        color=discord.Color.orange(),
+        color=COLOR_ORANGE,
         user=user,
         fields=[
             ("User", f"{user.mention} (`{user.id}`)", False),
@@ -1425,7 +1945,7 @@ async def mute(interaction: discord.Interaction, user: discord.Member, minuten:
             ("Rollen entfernt", str(removed_count), True),
             ("Nicht entfernbar", cannot_txt, False),
         ],
-    )
+    ))
 
 
 @bot.tree.command(name="unmute", description="Entmutet einen User")
@@ -1434,65 +1954,44 @@ async def unmute(interaction: discord.Interaction, user: discord.Member):
     if not interaction.guild:
         return await interaction.response.send_message("Nur im Server nutzbar.", ephemeral=True)
 
-    muted_role = discord.utils.get(interaction.guild.roles, name=MUTED_ROLE_NAME)
+    muted_role = muted_role_for(interaction.guild)
     if not muted_role or muted_role not in user.roles:
         return await interaction.response.send_message("User ist nicht gemutet.", ephemeral=True)
 
+    # ab hier REST-Calls + DB -> sofort ACKen, damit das 3s-Fenster nicht abläuft
+    await interaction.response.defer(ephemeral=True)
+
     # Muted entfernen
     try:
         await user.remove_roles(muted_role, reason=f"Unmuted von {interaction.user}")
     except discord.Forbidden:
-        return await interaction.response.send_message("❌ Ich habe keine Rechte, Rollen zu entfernen.", ephemeral=True)
+        return await interaction.followup.send("❌ Ich habe keine Rechte, Rollen zu entfernen.", ephemeral=True)
 
-    # Rollen wiederherstellen
-    role_ids = pop_mute_roles_backup(interaction.guild.id, user.id)
-    to_add: list[discord.Role] = []
-    skipped = 0
+    await asyncio.to_thread(mute_db_delete, interaction.guild.id, user.id)
+    track_mute(interaction.guild.id, user.id, None)
+    _muted_users.discard((interaction.guild.id, user.id))
 
-    for rid in role_ids:
-        role = interaction.guild.get_role(rid)
-        if not role:
-            skipped += 1
-            continue
-        if role.managed or role.is_default():
-            skipped += 1
-            continue
-        if not can_bot_manage_role(interaction.guild, role):
-            skipped += 1
-            continue
-        to_add.append(role)
-
-    restored = 0
-    add_failed = False
-    if to_add:
+    async def _dm():
         try:
-            await user.add_roles(*to_add, reason=f"Restore roles after unmute | by {interaction.user}")
-            restored = len(to_add)
-        except discord.Forbidden:
-            add_failed = True
-            skipped += len(to_add)
-
-    conn = db()
-    try:
-        conn.execute("DELETE FROM mutes WHERE guild_id=? AND user_id=?", (interaction.guild.id, user.id))
-        conn.commit()
-    finally:
-        conn.close()
+            await user.send(f"✅ Du wurdest auf **{interaction.guild.name}** entmutet.")
+        except discord.HTTPException:
+            pass
 
-    try:
-        await user.send(f"✅ Du wurdest auf **{interaction.guild.name}** entmutet.")
-    except Exception:
-        pass
+    # Rollen wiederherstellen und DM hängen nur vom Entfernen der Muted-Rolle ab -> parallel
+    (restored, skipped, add_failed), _ = await asyncio.gather(
+        restore_backup_roles(interaction.guild, user, f"Restore roles after unmute | by {interaction.user}"),
+        _dm(),
+    )
 
-    await interaction.response.send_message(
+    await interaction.followup.send(
         f"✅ {user.mention} wurde entmutet. Rollen restored: **{restored}**, skipped: **{skipped}**.",
         ephemeral=True
     )
 
-    await send_log(
+    spawn(send_log(
         interaction.guild,
         title="🔊 User entmutet",
-        color=discord.Color.green(),
+        color=COLOR_GREEN,
         user=user,
         fields=[
             ("User", f"{user.mention} (`{user.id}`)", False),
@@ -1501,7 +2000,7 @@ async def unmute(interaction: discord.Interaction, user: discord.Member):
             ("Rollen skipped", str(skipped), True),
             ("Add Roles failed", "Ja" if add_failed else "Nein", True),
         ],
-    )
+    ))
 
 
 # ==================== Economy Commands ====================
@@ -1511,10 +2010,13 @@ async def balance(interaction: discord.Interaction, user: discord.Member | None
     if not interaction.guild:
         return await interaction.response.send_message("Nur im Server nutzbar.", ephemeral=True)
     user = user or interaction.user
-    bal, _ = econ_get(interaction.guild.id, user.id)
+    bal, _ = await econ_get_async(interaction.guild.id, user.id)
     await interaction.response.send_message(f"💰 {user.mention} hat **{bal}** Coins.", ephemeral=True)
 
 
+DAILY_COOLDOWN = 24 * 3600
+
+
 @bot.tree.command(name="daily", description="Tägliche Coins abholen (alle 24h)")
 async def daily(interaction: discord.Interaction):
     if not interaction.guild:
@@ -1522,27 +2024,21 @@ async def daily(interaction: discord.Interaction):
 
     guild_id = interaction.guild.id
     user_id = interaction.user.id
-    bal, last = econ_get(guild_id, user_id)
+    _, last = await econ_get_async(guild_id, user_id)
 
-    now = now_utc()
-    if last:
-        try:
-            last_dt = datetime.datetime.fromisoformat(last)
-            if now - last_dt < datetime.timedelta(hours=24):
-                remaining = datetime.timedelta(hours=24) - (now - last_dt)
-                hours = int(remaining.total_seconds() // 3600)
-                mins = int((remaining.total_seconds() % 3600) // 60)
-                return await interaction.response.send_message(
-                    f"⏳ Daily schon benutzt. Warte noch **{hours}h {mins}m**.",
-                    ephemeral=True
-                )
-        except Exception:
-            pass
+    now_ts = int(time.time())
+    if last is not None:
+        remaining = DAILY_COOLDOWN - (now_ts - last)
+        if remaining > 0:
+            hours, rest = divmod(remaining, 3600)
+            return await interaction.response.send_message(
+                f"⏳ Daily schon benutzt. Warte noch **{hours}h {rest // 60}m**.",
+                ephemeral=True
+            )
 
-    reward = random.randint(50, 150)
-    econ_set_balance(guild_id, user_id, bal + reward)
-    econ_set_daily(guild_id, user_id, now.isoformat())
-    await interaction.response.send_message(f"✅ Daily erhalten: **+{reward}** Coins. (Neu: {bal + reward})", ephemeral=True)
+    reward = _RNG.randint(50, 150)
+    new_bal = await econ_claim_daily_async(guild_id, user_id, reward, now_ts)
+    await interaction.response.send_message(f"✅ Daily erhalten: **+{reward}** Coins. (Neu: {new_bal})", ephemeral=True)
 
 
 @bot.tree.command(name="pay", description="Zahle Coins an einen User")
@@ -1559,15 +2055,9 @@ async def pay(interaction: discord.Interaction, user: discord.Member, amount: in
     sender_id = interaction.user.id
     recv_id = user.id
 
-    sender_bal, _ = econ_get(guild_id, sender_id)
-    recv_bal, _ = econ_get(guild_id, recv_id)
-
-    if sender_bal < amount:
+    if not await econ_transfer_async(guild_id, sender_id, recv_id, amount):
         return await interaction.response.send_message("❌ Nicht genug Coins.", ephemeral=True)
 
-    econ_set_balance(guild_id, sender_id, sender_bal - amount)
-    econ_set_balance(guild_id, recv_id, recv_bal + amount)
-
     await interaction.response.send_message(
         f"✅ {interaction.user.mention} hat **{amount}** Coins an {user.mention} gezahlt.",
         ephemeral=False
@@ -1590,19 +2080,21 @@ async def info(interaction: discord.Interaction):
     )
 
 
+HELP_TEXT = (
+    "✅ **Commands**\n"
+    "Moderation: /clear /kick /ban /timeout /mute /unmute /mute_setup\n"
+    "Tickets: /ticket_setup /ticket create /ticket close\n"
+    "Roles: /role_setup\n"
+    "Market: /market_setup_berlin /market_setup_poland\n"
+    "Economy: /balance /daily /pay\n"
+    "Fun: /roll /coinflip /8ball\n"
+    "Info: /ping /info /avatar /userinfo /serverinfo"
+)
+
+
 @bot.tree.command(name="helpme", description="Zeigt eine Befehlsübersicht")
 async def helpme(interaction: discord.Interaction):
-    await interaction.response.send_message(
-        "✅ **Commands**\n"
-        "Moderation: /clear /kick /ban /timeout /mute /unmute /mute_setup\n"
-        "Tickets: /ticket_setup /ticket create /ticket close\n"
-        "Roles: /role_setup\n"
-        "Market: /market_setup_berlin /market_setup_poland\n"
-        "Economy: /balance /daily /pay\n"
-        "Fun: /roll /coinflip /8ball\n"
-        "Info: /ping /info /avatar /userinfo /serverinfo",
-        ephemeral=True
-    )
+    await interaction.response.send_message(HELP_TEXT, ephemeral=True)
 
 
 @bot.tree.command(name="avatar", description="Zeigt den Avatar eines Users")
@@ -1618,11 +2110,11 @@ async def userinfo(interaction: discord.Interaction, user: discord.Member | None
     if not interaction.guild:
         return await interaction.response.send_message("Nur im Server nutzbar.", ephemeral=True)
     user = user or interaction.user
-    emb = discord.Embed(title="Userinfo", color=discord.Color.blurple())
+    emb = discord.Embed(title="Userinfo", color=COLOR_BLURPLE)
     emb.set_thumbnail(url=user.display_avatar.url)
     emb.add_field(name="User", value=f"{user} ({user.id})", inline=False)
-    emb.add_field(name="Joined Server", value=user.joined_at.strftime("%d.%m.%Y %H:%M") if user.joined_at else "—", inline=False)
-    emb.add_field(name="Created", value=user.created_at.strftime("%d.%m.%Y %H:%M"), inline=False)
+    emb.add_field(name="Joined Server", value=user.joined_at.strftime(CREATED_FMT) if user.joined_at else "—", inline=False)
+    emb.add_field(name="Created", value=user.created_at.strftime(CREATED_FMT), inline=False)
     emb.add_field(name="Roles", value=fmt_roles(user), inline=False)
     await interaction.response.send_message(embed=emb, ephemeral=True)
 
@@ -1632,7 +2124,7 @@ async def serverinfo(interaction: discord.Interaction):
     if not interaction.guild:
         return await interaction.response.send_message("Nur im Server nutzbar.", ephemeral=True)
     g = interaction.guild
-    emb = discord.Embed(title="Serverinfo", color=discord.Color.green())
+    emb = discord.Embed(title="Serverinfo", color=COLOR_GREEN)
     if g.icon:
         emb.set_thumbnail(url=g.icon.url)
     emb.add_field(name="Name", value=g.name, inline=False)
@@ -1642,261 +2134,456 @@ async def serverinfo(interaction: discord.Interaction):
     await interaction.response.send_message(embed=emb, ephemeral=True)
 
 
+_COINFLIP = ("Kopf", "Zahl")
+_EIGHTBALL = (
+    "Ja.", "Nein.", "Vielleicht.", "Sehr wahrscheinlich.", "Unwahrscheinlich.",
+    "Frag später nochmal.", "Ich glaube schon.", "Auf keinen Fall.", "Sieht gut aus.", "Keine Ahnung."
+)
+
+
 @bot.tree.command(name="roll", description="Würfeln (Standard 1-100)")
 @app_commands.describe(maximum="Max (optional)")
 async def roll(interaction: discord.Interaction, maximum: int | None = None):
     maximum = maximum or 100
     maximum = max(1, min(100000, maximum))
-    value = random.randint(1, maximum)
+    value = _RNG.randint(1, maximum)
     await interaction.response.send_message(f"🎲 {interaction.user.mention} rolled **{value}** (1-{maximum})")
 
 
 @bot.tree.command(name="coinflip", description="Kopf oder Zahl")
 async def coinflip(interaction: discord.Interaction):
-    await interaction.response.send_message(f"🪙 Ergebnis: **{random.choice(['Kopf', 'Zahl'])}**")
+    await interaction.response.send_message(f"🪙 Ergebnis: **{_COINFLIP[_RNG.getrandbits(1)]}**")
 
 
 @bot.tree.command(name="8ball", description="Magic 8 Ball")
 @app_commands.describe(frage="Deine Frage")
 async def eightball(interaction: discord.Interaction, frage: str):
-    answers = [
-        "Ja.", "Nein.", "Vielleicht.", "Sehr wahrscheinlich.", "Unwahrscheinlich.",
-        "Frag später nochmal.", "Ich glaube schon.", "Auf keinen Fall.", "Sieht gut aus.", "Keine Ahnung."
-    ]
-    await interaction.response.send_message(f"🎱 Frage: **{frage}**\nAntwort: **{random.choice(answers)}**")
+    await interaction.response.send_message(f"🎱 Frage: **{frage}**\nAntwort: **{_RNG.choice(_EIGHTBALL)}**")
 
 
 # ==================== Muted Message Enforcement ====================
 # Strikter als Permissions: wenn gemutet, dann darf user nur im UNMUTE channel
-# und in seinem eigenen Ticket schreiben (Topic user_id=...).
+# und in seinem eigenen Ticket schreiben (Besitzer laut ticket_owners).
 @bot.event
 async def on_message(message: discord.Message):
+    # reiner Slash-Command-Bot (keine Prefix-Commands) -> kein bot.process_commands nötig
     if message.author.bot:
         return
 
     if not message.guild or not isinstance(message.author, discord.Member):
-        return await bot.process_commands(message)
+        return
 
     member = message.author
-    muted_role = discord.utils.get(message.guild.roles, name=MUTED_ROLE_NAME)
-    if muted_role and muted_role in member.roles:
-        # Allow: UNMUTE channel
-        if UNMUTE_CHANNEL_ID and isinstance(message.channel, discord.TextChannel) and message.channel.id == UNMUTE_CHANNEL_ID:
-            return await bot.process_commands(message)
-
-        # Allow: own ticket channel (topic user_id=member.id AND in ticket category)
-        allowed = False
-        if isinstance(message.channel, discord.TextChannel):
-            try:
-                topic_data = parse_topic(message.channel.topic)
-                owner_id = int(topic_data.get("user_id", "0") or 0)
-                if owner_id == member.id and (TICKET_CATEGORY_ID is None or message.channel.category_id == TICKET_CATEGORY_ID):
-                    allowed = True
-            except Exception:
-                allowed = False
-
-        if not allowed:
-            try:
-                await message.delete()
-            except Exception:
-                pass
+    if (message.guild.id, member.id) not in _muted_users:
+        return
 
-            # kurzer Hinweis (auto-delete)
-            try:
-                warn = await message.channel.send(
-                    f"🔇 {member.mention} du bist gemutet. Du darfst nur im <#{UNMUTE_CHANNEL_ID}> "
-                    f"und in **deinen** Ticket-Channels schreiben."
-                )
-                await asyncio.sleep(6)
-                await warn.delete()
-            except Exception:
-                pass
+    muted_role = muted_role_for(message.guild)
+    if not (muted_role and muted_role in member.roles):
+        return
 
-            return  # block processing
+    # Allow: UNMUTE channel
+    if UNMUTE_CHANNEL_ID and message.channel.id == UNMUTE_CHANNEL_ID:
+        return
+
+    # Allow: own ticket channel (Besitzer aus dem Ticket-Index, in der Ticket-Kategorie)
+    if ticket_owners.get(message.channel.id) == member.id and (
+        TICKET_CATEGORY_ID is None or getattr(message.channel, "category_id", None) == TICKET_CATEGORY_ID
+    ):
+        return
+
+    try:
+        await message.delete()
+    except discord.HTTPException:
+        pass
 
-    await bot.process_commands(message)
+    # kurzer Hinweis (auto-delete)
+    try:
+        warn = await message.channel.send(
+            f"🔇 {member.mention} du bist gemutet. Du darfst nur im <#{UNMUTE_CHANNEL_ID}> "
+            f"und in **deinen** Ticket-Channels schreiben."
+        )
+        await asyncio.sleep(6)
+        await warn.delete()
+    except discord.HTTPException:
+        pass
 
 
 # ==================== Auto Unmute Loop ====================
-@tasks.loop(seconds=30)
-async def auto_unmute_loop():
-    conn = db()
+# Kein festes 30s-Polling: schläft bis zum nächsten Ablauf, /mute und /unmute wecken ihn auf.
+# Zeit-Mutes liegen zusätzlich als Heap im Speicher -> die Schleife fragt SQLite nie ab,
+# die DB wird nur beim Start gelesen und beim Aufräumen geschrieben.
+AUTO_UNMUTE_MAX_SLEEP = 3600
+AUTO_UNMUTE_MIN_SLEEP = 30
+
+_mutes_changed = asyncio.Event()
+_auto_unmute_task: asyncio.Task | None = None
+
+_mute_heap: list[tuple[int, int, int]] = []        # (unmute_at, guild_id, user_id), veraltete Einträge bleiben liegen
+_mute_deadline: dict[tuple[int, int], int] = {}    # (guild_id, user_id) -> aktuell gültiges unmute_at
+
+
+def track_mute(guild_id: int, user_id: int, unmute_at: int | None):
+    key = (guild_id, user_id)
+    if unmute_at is None:
+        _mute_deadline.pop(key, None)
+    else:
+        _mute_deadline[key] = unmute_at
+        heapq.heappush(_mute_heap, (unmute_at, guild_id, user_id))
+    _mutes_changed.set()
+
+
+async def load_timed_mutes():
+    rows = await asyncio.to_thread(mute_db_timed)
+    for guild_id, user_id, unmute_at in rows:
+        # während des Ladens per /mute gesetzte Werte sind neuer
+        if (guild_id, user_id) not in _mute_deadline:
+            _mute_deadline[(guild_id, user_id)] = unmute_at
+            _mute_heap.append((unmute_at, guild_id, user_id))
+    heapq.heapify(_mute_heap)
+
+
+def pop_expired_mutes(now_ts: int) -> list[tuple[int, int, int]]:
+    expired = []
+    while _mute_heap and _mute_heap[0][0] <= now_ts:
+        unmute_at, guild_id, user_id = heapq.heappop(_mute_heap)
+        if _mute_deadline.get((guild_id, user_id)) == unmute_at:
+            del _mute_deadline[(guild_id, user_id)]
+            expired.append((guild_id, user_id, unmute_at))
+    return expired
+
+
+def next_mute_expiry() -> int | None:
+    # veraltete Köpfe (unmuted / neu gemutet) verwerfen
+    while _mute_heap:
+        unmute_at, guild_id, user_id = _mute_heap[0]
+        if _mute_deadline.get((guild_id, user_id)) == unmute_at:
+            return unmute_at
+        heapq.heappop(_mute_heap)
+    return None
+
+
+async def restore_backup_roles(guild: discord.Guild, member: discord.Member, reason: str) -> tuple[int, int, bool]:
+    # gesicherte Rollen zurückgeben -> (restored, skipped, add_failed)
+    role_ids = await asyncio.to_thread(pop_mute_roles_backup, guild.id, member.id)
+    bot_top = bot_top_role(guild)
+    # can_bot_manage_role prüft managed/@everyone bereits mit
+    to_add = [r for r in map(guild.get_role, role_ids) if r is not None and can_bot_manage_role(r, bot_top)]
+    skipped = len(role_ids) - len(to_add)
+
+    if not to_add:
+        return 0, skipped, False
     try:
-        rows = conn.execute("SELECT guild_id, user_id, unmute_at FROM mutes WHERE unmute_at IS NOT NULL").fetchall()
-    finally:
-        conn.close()
+        await member.add_roles(*to_add, reason=reason)
+    except discord.HTTPException:
+        return 0, skipped + len(to_add), True
+    return len(to_add), skipped, False
 
-    now = now_utc()
+
+async def _auto_unmute_member(guild: discord.Guild, muted_role: discord.Role | None, user_id: int):
+    member = guild.get_member(user_id)
+    if not (member and muted_role and muted_role in member.roles):
+        return
+
+    try:
+        await member.remove_roles(muted_role, reason="Auto-Unmute (Timer)")
+    except discord.HTTPException:
+        return
+    _muted_users.discard((guild.id, user_id))
+
+    restored, skipped, _ = await restore_backup_roles(guild, member, "Restore roles after auto-unmute")
+
+    spawn(send_log(
+        guild,
+        title="⏱️ Auto-Unmute",
+        color=COLOR_GREEN,
+        user=member,
+        fields=[
+            ("User", f"{member.mention} (`{member.id}`)", False),
+            ("Grund", "Timer abgelaufen", True),
+            ("Rollen restored", str(restored), True),
+            ("Rollen skipped", str(skipped), True),
+        ],
+    ))
+
+
+AUTO_UNMUTE_CONCURRENCY = 8
+
+
+async def process_expired_mutes():
+    now_ts = int(now_utc().timestamp())
+    rows = pop_expired_mutes(now_ts)
+    if not rows:
+        return
+    expired: list[tuple[int, int, int]] = []
+    rows_by_guild: dict[int, list[tuple[int, int]]] = defaultdict(list)
     for guild_id, user_id, unmute_at in rows:
-        try:
-            unmute_time = datetime.datetime.fromisoformat(unmute_at)
-        except Exception:
-            continue
+        rows_by_guild[guild_id].append((user_id, unmute_at))
+
+    # alle fälligen Unmutes (über Guilds hinweg) parallel, aber begrenzt (Rate-Limits)
+    sem = asyncio.Semaphore(AUTO_UNMUTE_CONCURRENCY)
 
-        if now >= unmute_time:
+    async def _one(guild: discord.Guild, muted_role: discord.Role | None, user_id: int):
+        async with sem:
+            try:
+                await _auto_unmute_member(guild, muted_role, user_id)
+            except Exception as e:
+                print("Auto-Unmute error:", e)
+
+    async with asyncio.TaskGroup() as tg:
+        for guild_id, entries in rows_by_guild.items():
             guild = bot.get_guild(guild_id)
             if not guild:
+                # Guild (noch) nicht im Cache -> wieder einreihen, nächster Versuch nach AUTO_UNMUTE_MIN_SLEEP.
+                # Nicht über track_mute: das Event würde den Loop sofort wieder wecken.
+                for uid, ts in entries:
+                    if (guild_id, uid) not in _mute_deadline:
+                        _mute_deadline[(guild_id, uid)] = ts
+                        heapq.heappush(_mute_heap, (ts, guild_id, uid))
                 continue
 
-            member = guild.get_member(user_id)
-            muted_role = discord.utils.get(guild.roles, name=MUTED_ROLE_NAME)
-
-            did_unmute = False
-            restored = 0
-            skipped = 0
-
-            if member and muted_role and muted_role in member.roles:
-                try:
-                    await member.remove_roles(muted_role, reason="Auto-Unmute (Timer)")
-                    did_unmute = True
-                except Exception:
-                    did_unmute = False
-
-                if did_unmute:
-                    role_ids = pop_mute_roles_backup(guild_id, user_id)
-                    to_add: list[discord.Role] = []
-                    for rid in role_ids:
-                        role = guild.get_role(rid)
-                        if not role:
-                            skipped += 1
-                            continue
-                        if role.managed or role.is_default():
-                            skipped += 1
-                            continue
-                        if not can_bot_manage_role(guild, role):
-                            skipped += 1
-                            continue
-                        to_add.append(role)
-
-                    if to_add:
-                        try:
-                            await member.add_roles(*to_add, reason="Restore roles after auto-unmute")
-                            restored = len(to_add)
-                        except Exception:
-                            skipped += len(to_add)
-
-            # mutes entry cleanup
-            conn2 = db()
-            try:
-                conn2.execute("DELETE FROM mutes WHERE guild_id=? AND user_id=?", (guild_id, user_id))
-                conn2.commit()
-            finally:
-                conn2.close()
-
-            if did_unmute and member:
-                await send_log(
-                    guild,
-                    title="⏱️ Auto-Unmute",
-                    color=discord.Color.green(),
-                    user=member,
-                    fields=[
-                        ("User", f"{member.mention} (`{member.id}`)", False),
-                        ("Grund", "Timer abgelaufen", True),
-                        ("Rollen restored", str(restored), True),
-                        ("Rollen skipped", str(skipped), True),
-                    ],
-                )
-
-
-@auto_unmute_loop.before_loop
-async def before_auto_unmute():
+            muted_role = muted_role_for(guild)  # einmal pro Guild auflösen
+            for uid, _ in entries:
+                tg.create_task(_one(guild, muted_role, uid))
+            expired.extend((guild_id, uid, ts) for uid, ts in entries)
+
+    # mutes entry cleanup (gesammelt, ein executemany nach der Schleife)
+    await asyncio.to_thread(mute_db_delete_expired, expired)
+
+
+async def auto_unmute_loop():
     await bot.wait_until_ready()
+    await load_timed_mutes()
+    while not bot.is_closed():
+        _mutes_changed.clear()
+        try:
+            await process_expired_mutes()
+        except Exception as e:
+            print("Auto-Unmute error:", e)
 
+        next_at = next_mute_expiry()
+        if next_at is None:
+            delay = AUTO_UNMUTE_MAX_SLEEP
+        else:
+            delay = min(AUTO_UNMUTE_MAX_SLEEP, next_at - int(now_utc().timestamp()))
+            # Nach dem Durchlauf noch fällig = Guild nicht im Cache -> nicht im Kreis drehen
+            if delay <= 0:
+                delay = AUTO_UNMUTE_MIN_SLEEP
 
-# ==================== Events ====================
-@bot.event
-async def on_member_join(member: discord.Member):
-    welcome_ch = await get_text_channel(member.guild, WELCOME_CHANNEL_ID)
-    if welcome_ch:
-        banner_url = member.guild.banner.url if member.guild.banner else None
-        emb = discord.Embed(
-            title="New user! :D",
-            description=f"Welcome {member.mention}",
-            color=discord.Color.green()
-        )
-        emb.set_thumbnail(url=member.display_avatar.url)
-        emb.set_image(url=banner_url or member.display_avatar.url)
-        emb.add_field(name="Number of users", value=str(member.guild.member_count), inline=False)
         try:
-            await welcome_ch.send(embed=emb)
-        except discord.Forbidden:
+            await asyncio.wait_for(_mutes_changed.wait(), timeout=delay)
+        except asyncio.TimeoutError:
             pass
 
+
+# ==================== Events ====================
+# statischer Teil der Join/Leave-Log-Embeds, pro Event nur noch die variablen Felder
+_JOIN_LOG_EMBED = {"type": "rich", "title": "Member joined", "color": COLOR_GREEN.value}
+_LEAVE_LOG_EMBED = {"type": "rich", "title": "Member left", "color": COLOR_RED.value}
+
+
+def join_method_text(jm: dict, unknown: str) -> str:
+    if jm["method"] == "vanity":
+        return "Vanity Invite"
+    if jm["method"] == "invite":
+        return f"Invite `{jm['code']}` • invited by {jm['inviter_mention'] or 'Unbekannt'}"
+    return unknown
+
+
+async def send_welcome(member: discord.Member):
+    welcome_ch = get_text_channel(member.guild, WELCOME_CHANNEL_ID)
+    if not welcome_ch:
+        return
+    banner_url = member.guild.banner.url if member.guild.banner else None
+    emb = discord.Embed(
+        title="New user! :D",
+        description=f"Welcome {member.mention}",
+        color=COLOR_GREEN
+    )
+    emb.set_thumbnail(url=member.display_avatar.url)
+    emb.set_image(url=banner_url or member.display_avatar.url)
+    emb.add_field(name="Number of users", value=str(member.guild.member_count), inline=False)
+    try:
+        await welcome_ch.send(embed=emb)
+    except discord.Forbidden:
+        pass
+
+
+async def log_member_join(member: discord.Member):
+    # Join-Methode wird nur fürs Log gebraucht -> ohne Log-Channel kein invites()-Fetch
+    if not _LOG_ENABLED:
+        return
+
     jm = await detect_join_method(member.guild)
-    join_method_cache[(member.guild.id, member.id)] = jm
+    remember_join_method(member.guild.id, member.id, jm)
 
-    log_ch = await get_log_channel(member.guild)
+    log_ch = get_log_channel(member.guild)
     if log_ch:
-        emb = discord.Embed(title="Member joined", color=discord.Color.green())
-        emb.set_author(name=str(member), icon_url=member.display_avatar.url)
-        emb.set_thumbnail(url=member.display_avatar.url)
-        emb.add_field(
-            name="Joined Discord",
-            value=f"{member.created_at.strftime('%d.%m.%Y %H:%M')} • {discord_account_age(member)}",
-            inline=False
-        )
-        emb.add_field(name="User", value=f"{member.mention} ({member.id})", inline=False)
+        avatar = member.display_avatar.url
+        emb = discord.Embed.from_dict({
+            **_JOIN_LOG_EMBED,
+            "author": {"name": str(member), "icon_url": avatar},
+            "thumbnail": {"url": avatar},
+            "fields": [
+                {"name": "Joined Discord",
+                 "value": f"{member.created_at.strftime(CREATED_FMT)} • {discord_account_age(member)}",
+                 "inline": False},
+                {"name": "User", "value": f"{member.mention} ({member.id})", "inline": False},
+                {"name": "Join method", "value": join_method_text(jm, "Unknown (fehlende Invite-Rechte?)"), "inline": False},
+            ],
+        })
+        await log_ch.send(embed=emb)
 
-        if jm["method"] == "vanity":
-            emb.add_field(name="Join method", value="Vanity Invite", inline=False)
-        elif jm["method"] == "invite":
-            inviter_txt = jm["inviter"].mention if jm["inviter"] else "Unbekannt"
-            emb.add_field(name="Join method", value=f"Invite `{jm['code']}` • invited by {inviter_txt}", inline=False)
-        else:
-            emb.add_field(name="Join method", value="Unknown (fehlende Invite-Rechte?)", inline=False)
 
-        await log_ch.send(embed=emb)
+@bot.event
+async def on_member_join(member: discord.Member):
+    # Welcome läuft parallel zu Invite-Fetch + Log, die hängen nicht voneinander ab
+    welcome_task = asyncio.create_task(send_welcome(member))
+    try:
+        await log_member_join(member)
+    finally:
+        await welcome_task
 
 
 @bot.event
 async def on_member_remove(member: discord.Member):
-    log_ch = await get_log_channel(member.guild)
+    if not _LOG_ENABLED:
+        return
+    log_ch = get_log_channel(member.guild)
     if not log_ch:
         return
 
-    jm = join_method_cache.get((member.guild.id, member.id), {"method": "unknown", "code": None, "inviter": None})
-    if jm["method"] == "vanity":
-        join_txt = "Vanity Invite"
-    elif jm["method"] == "invite":
-        inviter_txt = jm["inviter"].mention if jm["inviter"] else "Unbekannt"
-        join_txt = f"Invite `{jm['code']}` • invited by {inviter_txt}"
-    else:
-        join_txt = "Unknown"
-
-    emb = discord.Embed(title="Member left", color=discord.Color.red())
-    emb.set_author(name=str(member), icon_url=member.display_avatar.url)
-    emb.set_thumbnail(url=member.display_avatar.url)
-    emb.add_field(name="Roles", value=fmt_roles(member), inline=False)
-    emb.add_field(name="User", value=f"<@{member.id}> ({member.id})", inline=False)
-    emb.add_field(name="Joined via", value=join_txt, inline=False)
+    jm = join_method_cache.pop((member.guild.id, member.id), JOIN_METHOD_UNKNOWN)
+    avatar = member.display_avatar.url
+    emb = discord.Embed.from_dict({
+        **_LEAVE_LOG_EMBED,
+        "author": {"name": str(member), "icon_url": avatar},
+        "thumbnail": {"url": avatar},
+        "fields": [
+            {"name": "Roles", "value": fmt_roles(member), "inline": False},
+            {"name": "User", "value": f"<@{member.id}> ({member.id})", "inline": False},
+            {"name": "Joined via", "value": join_method_text(jm, "Unknown"), "inline": False},
+        ],
+    })
     await log_ch.send(embed=emb)
 
 
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    if before.roles != after.roles:
+        # Muted-Rolle auch außerhalb von /mute (manuell) vergeben/entfernt
+        muted_role = muted_role_for(after.guild)
+        if muted_role:
+            key = (after.guild.id, after.id)
+            if after.get_role(muted_role.id):
+                _muted_users.add(key)
+            else:
+                _muted_users.discard(key)
+
+
+@bot.event
+async def on_guild_role_update(before: discord.Role, after: discord.Role):
+    if before.name != after.name and _muted_role_cache.get(after.guild.id) == after.id:
+        _muted_role_cache.pop(after.guild.id, None)
+        forget_muted_guild(after.guild.id)
+        index_muted_members(after.guild)
+
+
+@bot.event
+async def on_guild_role_create(role: discord.Role):
+    # Staff-Rolle mit konfigurierter ID nachträglich angelegt -> gecachte Staff-Rollen/Ping neu bauen
+    if role.id in TICKET_STAFF_ROLE_SET:
+        _staff_roles_cache.pop(role.guild.id, None)
+
+
+@bot.event
+async def on_guild_role_delete(role: discord.Role):
+    _staff_roles_cache.pop(role.guild.id, None)
+    if _muted_role_cache.get(role.guild.id) == role.id:
+        del _muted_role_cache[role.guild.id]
+        forget_muted_guild(role.guild.id)
+        index_muted_members(role.guild)
+    _mute_overwrites_ok.discard((role.guild.id, role.id))
+
+
+@bot.event
+async def on_guild_channel_delete(channel: discord.abc.GuildChannel):
+    if channel.id == UNMUTE_CHANNEL_ID:
+        _unmute_hint_cache.pop(channel.guild.id, None)
+    if not isinstance(channel, discord.TextChannel):
+        return
+    owner_id = ticket_owners.pop(channel.id, 0)
+    idx = ticket_index.get(channel.guild.id)
+    if idx and owner_id and idx.get(owner_id) == channel.id:
+        del idx[owner_id]
+
+
+@bot.event
+async def on_guild_channel_create(channel: discord.abc.GuildChannel):
+    # neuer Text-Channel hat noch keine Muted-Overwrites -> beim nächsten /mute neu prüfen
+    if isinstance(channel, discord.TextChannel):
+        rid = _muted_role_cache.get(channel.guild.id)
+        _mute_overwrites_ok.discard((channel.guild.id, rid))
+
+
+@bot.event
+async def on_guild_channel_update(before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+    if after.id == UNMUTE_CHANNEL_ID and before.name != after.name:
+        _unmute_hint_cache.pop(after.guild.id, None)
+    rid = _muted_role_cache.get(after.guild.id)
+    if rid and (after.guild.id, rid) in _mute_overwrites_ok and isinstance(after, discord.TextChannel):
+        role = after.guild.get_role(rid)
+        if role and before.overwrites_for(role) != after.overwrites_for(role):
+            _mute_overwrites_ok.discard((after.guild.id, rid))
+
+
 @bot.event
 async def on_guild_join(guild: discord.Guild):
+    index_ticket_channels(guild)
+    index_muted_members(guild)
     await refresh_invites_for_guild(guild)
 
 
+_tree_synced = False
+
+
 @bot.event
 async def on_ready():
-    bot.add_view(TicketOpenView())
-    bot.add_view(RolePanelView())
-    bot.add_view(MarketOpenViewBerlin())
-    bot.add_view(MarketOpenViewPoland())
-    bot.add_view(MarketListingView(disabled=False))
+    bot.add_view(panel_view(TicketOpenView))
+    bot.add_view(panel_view(RolePanelView))
+    bot.add_view(panel_view(MarketOpenViewBerlin))
+    bot.add_view(panel_view(MarketOpenViewPoland))
+    bot.add_view(panel_view(MarketListingView, False))
 
-    if not auto_unmute_loop.is_running():
-        auto_unmute_loop.start()
+    global _auto_unmute_task, _tree_synced
+    if _auto_unmute_task is None or _auto_unmute_task.done():
+        _auto_unmute_task = asyncio.create_task(auto_unmute_loop())
 
     print(f"✅ Online als {bot.user} ({bot.user.id})")
 
-    for g in bot.guilds:
-        await refresh_invites_for_guild(g)
+    guilds = bot.guilds
+    for g in guilds:
+        index_ticket_channels(g)
+        index_muted_members(g)
 
-    try:
-        await bot.tree.sync()
-    except Exception as e:
-        print("Sync error:", e)
+    # Invite-Caches aller Guilds parallel füllen (Fan-out begrenzt wegen globalem Rate-Limit)
+    sem = asyncio.Semaphore(INVITE_REFRESH_CONCURRENCY)
+
+    async def _refresh(g: discord.Guild):
+        async with sem:
+            await refresh_invites_for_guild(g)
+
+    results = await asyncio.gather(*(_refresh(g) for g in guilds), return_exceptions=True)
+    for g, res in zip(guilds, results):
+        if isinstance(res, Exception):
+            print(f"Invite-Refresh error ({g.id}):", res)
+
+    # on_ready kommt bei jedem Reconnect erneut -> globalen Sync nur einmal pro Prozess
+    if not _tree_synced:
+        try:
+            await bot.tree.sync()
+            _tree_synced = True
+        except Exception as e:
+            print("Sync error:", e)
 
 
 bot.run(TOKEN)